@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+
+import metrics
+
+# The member fields build_member_data reads; everything else is left on Airtable's side.
+MEMBER_FIELDS = [
+    "Name",
+    "Email",
+    "Profile picture",
+    "Bio: Current professional role and why you want to enter",
+    "What's the link to your LinkedIn?",
+    "Twitter",
+    "What are your areas of expertise and interest?",
+    "Team or individual entry type",
+    "Looking for more team members?",
+    "Dietary requirements",
+    "Which City are you participating from?",
+]
+
+# Returned when a saved offset has expired; the listing has to start over.
+EXPIRED_OFFSET_ERROR = "LIST_RECORDS_ITERATOR_NOT_AVAILABLE"
+
+class Checkpoint:
+    """
+    Persists a listing cursor (query number + Airtable offset) so an interrupted read resumes
+    where it stopped. A checkpoint only applies to the exact queries it was saved for.
+
+    started_at (any JSON value) is saved with the cursor. A resumed listing keeps the value of the
+    run that started it, since the pages read before the interruption are not read again.
+    """
+
+    def __init__(self, path, url, queries, started_at=None):
+        self.path = path
+        self.key = hashlib.sha256(json.dumps([url, queries], sort_keys=True).encode("utf-8")).hexdigest()
+        self.started_at = started_at
+        saved = self.read()
+        if saved and saved.get("started_at") is not None:
+            self.started_at = saved["started_at"]
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r") as f:
+            saved = json.load(f)
+        return saved if saved.get("key") == self.key else None
+
+    def load(self):
+        saved = self.read()
+        return saved["cursor"] if saved else None
+
+    def save(self, cursor):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"key": self.key, "cursor": cursor, "started_at": self.started_at}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def next_cursor(query_index, page):
+    # Cursor of the page after this one: the next offset, or the start of the next query.
+    return [query_index, page["offset"]] if "offset" in page else [query_index + 1, None]
+
+def is_expired_offset(status_code, body):
+    return status_code == 422 and EXPIRED_OFFSET_ERROR in body
+
+async def aiter_pages(client, url, headers, queries, cursor=None):
+    """
+    Yields (records, cursor) for each page of each query in turn, starting from cursor, where
+    cursor points at the page after it. Requests go through an ingest_pipeline.HostLimitedClient
+    (which rate limits and retries). Saving the cursor is left to the caller, which knows when a page has been fully processed.
+    """
+    query_index, offset = cursor or [0, None]
+    while query_index < len(queries):
+        params = dict(queries[query_index])
+        if offset:
+            params["offset"] = offset
+        with metrics.span("airtable.request"):
+            response = await client.request("GET", url, headers=headers, params=params)
+        if offset and is_expired_offset(response.status_code, response.text):
+            print("Saved Airtable offset has expired, restarting the listing.")
+            offset = None
+            continue
+        response.raise_for_status()
+        page = response.json()
+        metrics.count("airtable.pages")
+        metrics.count("airtable.bytes_received", len(response.content))
+
+        cursor = next_cursor(query_index, page)
+        yield page.get("records", []), cursor
+        query_index, offset = cursor
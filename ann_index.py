@@ -0,0 +1,163 @@
+import os
+
+import numpy as np
+
+from member_index import normalize_rows
+from member_store import DATA_DIR, EMBEDDING_KEY, current_generation, generation_path, replace_file
+
+# Written for each generation of the member store, next to the embeddings it was built from.
+ANN_INDEX_FILE = "ann_index.npz"
+
+# Below this many members the exact scan is already only a few milliseconds, so no index is built.
+MIN_MEMBERS_FOR_ANN = 50000
+DEFAULT_N_PROBE = 8
+BLOCK_SIZE = 8192
+MAX_TRAINING_SAMPLE = 262144
+
+def ann_path(data_dir=DATA_DIR, generation=""):
+    return generation_path(ANN_INDEX_FILE, generation, data_dir)
+
+def default_n_lists(count):
+    return max(1, min(65536, int(4 * np.sqrt(count))))
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) coarse quantizer for approximate nearest-neighbour search.
+
+    Vectors are clustered with spherical k-means; each id is stored in the list of its nearest
+    centroid. A query only scores the ids in its n_probe closest lists, so raising n_probe trades
+    latency for recall. The vectors themselves stay in the member store, the index only keeps
+    centroids and list assignments.
+    """
+
+    def __init__(self, centroids, ids=None, assignments=None):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.ids = list(ids or [])
+        self.assignments = np.asarray(assignments if assignments is not None else [], dtype=np.int32)
+        self.position_by_id = {member_id: position for position, member_id in enumerate(self.ids)}
+        self._lists = None
+
+    @classmethod
+    def train(cls, vectors, ids, n_lists=None, iterations=10, sample_size=None, seed=0):
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        n_lists = min(n_lists or default_n_lists(len(vectors)), len(vectors))
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(len(vectors), sample_size or min(64 * n_lists, MAX_TRAINING_SAMPLE))
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+
+        for _ in range(iterations):
+            labels = assign_to_centroids(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=n_lists)
+            empty = counts == 0
+            # Re-seed empty lists with random sample points so every centroid stays useful.
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        index = cls(centroids)
+        index.add(vectors, ids)
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        return self._lists
+
+    def add(self, vectors, ids):
+        """
+        Inserts (or re-assigns) ids incrementally without retraining the centroids.
+        """
+        if len(ids) == 0:
+            return
+        labels = assign_to_centroids(normalize_rows(np.asarray(vectors, dtype=np.float32)), self.centroids)
+        new_labels = []
+        for member_id, label in zip(ids, labels):
+            position = self.position_by_id.get(member_id)
+            if position is None:
+                self.position_by_id[member_id] = len(self.ids)
+                self.ids.append(member_id)
+                new_labels.append(label)
+            else:
+                self.assignments[position] = label
+        self.assignments = np.concatenate([self.assignments, np.asarray(new_labels, dtype=np.int32)])
+        self._lists = None
+
+    def remove(self, ids):
+        keep = np.ones(len(self.ids), dtype=bool)
+        for member_id in ids:
+            position = self.position_by_id.get(member_id)
+            if position is not None:
+                keep[position] = False
+        self.ids = [member_id for member_id, kept in zip(self.ids, keep) if kept]
+        self.assignments = self.assignments[keep]
+        self.position_by_id = {member_id: position for position, member_id in enumerate(self.ids)}
+        self._lists = None
+
+    def candidate_positions(self, query_embedding, n_probe=DEFAULT_N_PROBE):
+        """
+        Returns the positions (in self.ids) stored in the n_probe lists closest to the query.
+        """
+        if not self.ids:
+            return np.array([], dtype=np.int64)
+        centroid_scores = self.centroids @ np.asarray(query_embedding, dtype=np.float32)
+        n_probe = min(n_probe, len(self.centroids))
+        probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        return np.concatenate([self.lists[i] for i in probed])
+
+    def candidates(self, query_embedding, n_probe=DEFAULT_N_PROBE):
+        return [self.ids[position] for position in self.candidate_positions(query_embedding, n_probe)]
+
+    def save(self, path):
+        ids = np.array(self.ids, dtype=str)
+        replace_file(path, lambda f: np.savez(f, centroids=self.centroids, assignments=self.assignments, ids=ids))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(saved["centroids"], saved["ids"].tolist(), saved["assignments"])
+
+def assign_to_centroids(vectors, centroids):
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), BLOCK_SIZE):
+        labels[start:start + BLOCK_SIZE] = np.argmax(vectors[start:start + BLOCK_SIZE] @ centroids.T, axis=1)
+    return labels
+
+def load_index(data_dir=DATA_DIR, generation=None):
+    """
+    Loads the index of a generation of the member store (the current one by default), or returns
+    None if none was built for it.
+    """
+    path = ann_path(data_dir, current_generation(data_dir) if generation is None else generation)
+    return IVFIndex.load(path) if os.path.exists(path) else None
+
+def embedded(members):
+    return [member for member in members if isinstance(member, dict) and member.get(EMBEDDING_KEY) is not None]
+
+def update_index(all_members, new_members, generation, deleted_ids=(), data_dir=DATA_DIR):
+    """
+    Writes the index for a new generation of the member store: the current generation's index with
+    new (or re-embedded) members inserted and deleted ones dropped, or a newly trained index once
+    the roster is large enough.
+    """
+    index = load_index(data_dir)
+    if index is not None:
+        index.remove(deleted_ids)
+        new_members = embedded(new_members)
+        index.add([member[EMBEDDING_KEY] for member in new_members], [member["id"] for member in new_members])
+    elif len(all_members) >= MIN_MEMBERS_FOR_ANN:
+        all_members = embedded(all_members)
+        print(f"Training ANN index over {len(all_members)} members...")
+        index = IVFIndex.train([member[EMBEDDING_KEY] for member in all_members], [member["id"] for member in all_members])
+    else:
+        return None
+    index.save(ann_path(data_dir, generation))
+    return index
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import base64
+import os
+import sys
+import threading
+
+import metrics
+
+IMAGES_DIR = "member_images"
+THUMBNAILS_DIR = os.path.join(IMAGES_DIR, "thumbnails")
+DEFAULT_IMAGE = os.path.join(IMAGES_DIR, "default.png")
+
+# Rendered at 100px (cards) and 20px (build updates); thumbnails are 2x for high-DPI screens.
+THUMBNAIL_SIZES = {"card": 200, "small": 40}
+CACHE_ENTRIES = 4096
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def thumbnail_path(image_path, size):
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(THUMBNAILS_DIR, f"{name}_{THUMBNAIL_SIZES[size]}.webp")
+
+def create_thumbnails(image_path):
+    """
+    Writes a square, center-cropped WebP thumbnail of the image for every display size.
+    """
+    from PIL import Image, ImageOps
+
+    os.makedirs(THUMBNAILS_DIR, exist_ok=True)
+    with Image.open(image_path) as image:
+        image = image.convert("RGBA")
+        for size, pixels in THUMBNAIL_SIZES.items():
+            thumbnail = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+            # Page renders can create the same thumbnail concurrently, so each writer has its own temp file.
+            tmp_path = f"{thumbnail_path(image_path, size)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            thumbnail.save(tmp_path, "WEBP", quality=80)
+            os.replace(tmp_path, thumbnail_path(image_path, size))
+
+def resolve_avatar(image_path, size):
+    """
+    Returns the file to serve for an avatar: its thumbnail (created on first use if missing),
+    else the original image, else the default image's thumbnail.
+    """
+    if not image_path or not os.path.exists(image_path):
+        image_path = DEFAULT_IMAGE
+    thumbnail = thumbnail_path(image_path, size)
+    if not os.path.exists(thumbnail) or os.path.getmtime(thumbnail) < os.path.getmtime(image_path):
+        try:
+            create_thumbnails(image_path)
+        except (ImportError, OSError) as error:
+            print(f"Could not create thumbnails for {image_path}: {error}")
+            return image_path
+    return thumbnail
+
+def encode_data_uri(path):
+    mime_type = "image/webp" if path.endswith(".webp") else "image/png"
+    with open(path, "rb") as image_file:
+        return f"data:{mime_type};base64,{base64.b64encode(image_file.read()).decode()}"
+
+def avatar_data_uri(image_path, size="card"):
+    """
+    Data URI for a member's avatar at the given display size, cached per process by path and mtime.
+    """
+    if not image_path or not os.path.exists(image_path):
+        image_path = DEFAULT_IMAGE
+    key = (image_path, size, os.path.getmtime(image_path))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            metrics.count("avatars.cache_hits")
+            return _cache[key]
+
+    metrics.count("avatars.cache_misses")
+    with metrics.span("avatars.encode"):
+        data_uri = encode_data_uri(resolve_avatar(image_path, size))
+    metrics.count("avatars.bytes_encoded", len(data_uri))
+    with _cache_lock:
+        _cache[key] = data_uri
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return data_uri
+
+if __name__ == "__main__":
+    # Backfill thumbnails for images downloaded before thumbnails existed.
+    images_dir = sys.argv[1] if len(sys.argv) > 1 else IMAGES_DIR
+    for file_name in sorted(os.listdir(images_dir)):
+        if file_name.endswith(".png"):
+            create_thumbnails(os.path.join(images_dir, file_name))
+    print(f"Thumbnails written to {THUMBNAILS_DIR}")
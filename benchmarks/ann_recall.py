@@ -0,0 +1,65 @@
+"""
+Recall-vs-exact benchmark for the IVF approximate search mode.
+
+    python benchmarks/ann_recall.py --members 200000 --dimensions 256
+    python benchmarks/ann_recall.py --data-dir data
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_index import IVFIndex  # noqa: E402
+from member_index import MemberIndex  # noqa: E402
+from member_store import load_members  # noqa: E402
+from synthetic import clustered_embeddings, queries as synthetic_queries  # noqa: E402
+
+def synthetic_members(count, dimensions):
+    # Only ids and embeddings: generating full records would dominate the runtime at large scales.
+    embeddings = clustered_embeddings(count, dimensions)
+    return [{"id": f"rec{i}", "combined_embedding": embeddings[i]} for i in range(count)]
+
+def time_queries(search, queries):
+    start = time.perf_counter()
+    results = [search(query) for query in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", help="Benchmark the member store in this directory instead of synthetic data")
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    members = load_members(args.data_dir) if args.data_dir else synthetic_members(args.members, args.dimensions)
+    queries = synthetic_queries(members, args.queries)
+
+    start = time.perf_counter()
+    index = MemberIndex(members)
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    index.ann_index = IVFIndex.train(index.embeddings, [member["id"] for member in index.members], n_lists=args.n_lists)
+    train_seconds = time.perf_counter() - start
+    print(f"{len(index)} members, {index.embeddings.shape[1]} dims, {len(index.ann_index.centroids)} lists "
+          f"(matrix build {build_seconds:.2f}s, IVF training {train_seconds:.2f}s)")
+
+    exact, exact_ms = time_queries(lambda query: index.search(query, args.k, exact=True), queries)
+    exact_ids = [set(member["id"] for member, _ in result) for result in exact]
+    print(f"{'mode':>12} {'recall@' + str(args.k):>10} {'ms/query':>10}")
+    print(f"{'exact':>12} {1.0:>10.3f} {exact_ms:>10.2f}")
+
+    for n_probe in args.n_probe:
+        approximate, approximate_ms = time_queries(lambda query: index.search(query, args.k, n_probe=n_probe), queries)
+        recall = np.mean([len(expected & set(member["id"] for member, _ in result)) / len(expected) for expected, result in zip(exact_ids, approximate)])
+        print(f"{'n_probe=' + str(n_probe):>12} {recall:>10.3f} {approximate_ms:>10.2f}")
+
+if __name__ == "__main__":
+    main()
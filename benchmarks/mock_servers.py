@@ -0,0 +1,278 @@
+"""
+Local stand-ins for the services a sync talks to. Airtable gets its own HTTP server (as it has its
+own host, and rate limit, in production); the rest share another:
+
+    /v0/<base>/<table>   Airtable list records: pagination, fields[], the sync's filterByFormula
+                         shapes and a per-base rate limit (429 past it)
+    /v1/embeddings       OpenAI embeddings with deterministic fake vectors
+    /images/<n>.png      profile pictures
+    /videos/<n>.mp4      demo videos (with ETag / If-None-Match)
+
+    python benchmarks/mock_servers.py --members 5000 --port 8787   # Airtable on port 8788
+"""
+import argparse
+from collections import deque
+from datetime import datetime, timezone
+import base64
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+
+MEMBERS_TABLE = ("appdxzy7MxhBwI8WY", "Members")
+PROJECTS_TABLE = ("appiKSYuNfWfcwigQ", "Table 1")
+SINCE_PATTERN = re.compile(r"IS_AFTER\(LAST_MODIFIED_TIME\(\), '([^']+)'\)")
+RECORD_ID_PATTERN = re.compile(r"RECORD_ID\(\)='([^']+)'")
+
+def fake_embedding(text, dimensions):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def parse_timestamp(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.000Z").replace(tzinfo=timezone.utc)
+
+def png_bytes(size=64):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (188, 119, 255)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+class Table:
+    """
+    Records of one Airtable table with their last-modified times. Filtered id lists are cached per
+    formula so paging through a large table doesn't re-filter it for every page.
+    """
+
+    def __init__(self, records):
+        self.records = {record["id"]: record for record in records}
+        self.modified = {record["id"]: parse_timestamp(record["createdTime"]) for record in records}
+        self.filtered = {}
+        self.lock = threading.Lock()
+
+    def matching_ids(self, formula):
+        with self.lock:
+            if formula not in self.filtered:
+                self.filtered[formula] = [record_id for record_id in self.records if self.matches(record_id, formula)]
+            return self.filtered[formula]
+
+    def matches(self, record_id, formula):
+        if not formula:
+            return True
+        since = SINCE_PATTERN.search(formula)
+        modified_after = since is not None and self.modified[record_id] > parse_timestamp(since.group(1))
+        record_ids = set(RECORD_ID_PATTERN.findall(formula))
+        if formula.startswith("AND(NOT("):
+            return not modified_after and record_id in record_ids
+        return modified_after or record_id in record_ids
+
+    def update(self, record_id, fields):
+        with self.lock:
+            self.records[record_id]["fields"].update(fields)
+            self.modified[record_id] = datetime.now(timezone.utc)
+            self.filtered.clear()
+
+    def delete(self, record_id):
+        with self.lock:
+            self.records.pop(record_id, None)
+            self.modified.pop(record_id, None)
+            self.filtered.clear()
+
+class MockServices:
+    """
+    Serves synthetic Airtable tables and fake embeddings on localhost. counters records the
+    requests served, including rate-limited ones.
+    """
+
+    def __init__(self, member_count, dimensions=1536, airtable_rate=5.0, page_size=100, video_bytes=256 * 1024,
+                 seed=0, host="127.0.0.1", port=0):
+        self.dimensions = dimensions
+        self.airtable_rate = airtable_rate
+        self.page_size = page_size
+        self.servers = [ThreadingHTTPServer((host, server_port), self.handler_class())
+                        for server_port in (port, port + 1 if port else 0)]
+        for server in self.servers:
+            server.daemon_threads = True
+        self.url, self.airtable_base_url = (f"http://{host}:{server.server_address[1]}" for server in self.servers)
+        member_records, project_records = synthetic.airtable_records(member_count, seed, base_url=self.url)
+        self.tables = {MEMBERS_TABLE: Table(member_records), PROJECTS_TABLE: Table(project_records)}
+        self.image = png_bytes()
+        self.video = np.random.default_rng(seed).integers(0, 256, video_bytes, dtype=np.uint8).tobytes()
+        self.request_times = {base: deque() for base, _ in self.tables}
+        self.counters = {"airtable_pages": 0, "airtable_throttled": 0, "embedding_requests": 0, "embedding_inputs": 0,
+                         "images": 0, "videos": 0, "videos_not_modified": 0}
+        self.lock = threading.Lock()
+        self.threads = []
+
+    @property
+    def airtable_url(self):
+        return f"{self.airtable_base_url}/v0"
+
+    @property
+    def openai_url(self):
+        return f"{self.url}/v1"
+
+    def start(self):
+        self.threads = [threading.Thread(target=server.serve_forever, daemon=True) for server in self.servers]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] += amount
+
+    def modify_members(self, fraction, seed=1):
+        """
+        Edits the bio and city of a random fraction of members, as if they were updated in Airtable
+        just now. The city is part of the embedded text, so these members are re-embedded.
+        """
+        table = self.tables[MEMBERS_TABLE]
+        record_ids = sorted(table.records)
+        rng = np.random.default_rng(seed)
+        changed = rng.choice(record_ids, int(len(record_ids) * fraction), replace=False)
+        for record_id in changed:
+            table.update(str(record_id), {"Bio: Current professional role and why you want to enter": synthetic.sentence(rng, 30),
+                                          "Which City are you participating from?": str(rng.choice(synthetic.CITIES))})
+        return [str(record_id) for record_id in changed]
+
+    def throttled(self, base):
+        # Sliding one-second window per base, like Airtable's per-base request limit.
+        if not self.airtable_rate:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            times = self.request_times[base]
+            while times and times[0] <= now - 1:
+                times.popleft()
+            if len(times) >= self.airtable_rate:
+                return True
+            times.append(now)
+            return False
+
+    def list_records(self, base, table_name, query):
+        table = self.tables.get((base, table_name))
+        if table is None:
+            return 404, {"error": {"type": "TABLE_NOT_FOUND"}}
+        if self.throttled(base):
+            self.count("airtable_throttled")
+            return 429, {"errors": [{"error": "RATE_LIMIT_REACHED"}]}
+
+        record_ids = table.matching_ids(query.get("filterByFormula", [""])[0])
+        start = int(query.get("offset", ["itr/0"])[0].split("/")[1])
+        page_size = min(int(query.get("pageSize", [self.page_size])[0]), 100)
+        fields = query.get("fields[]")
+        records = []
+        for record_id in record_ids[start:start + page_size]:
+            record = table.records.get(record_id)
+            if record is not None:
+                record_fields = {key: value for key, value in record["fields"].items() if not fields or key in fields}
+                records.append({"id": record_id, "createdTime": record["createdTime"], "fields": record_fields})
+        page = {"records": records}
+        if start + page_size < len(record_ids):
+            page["offset"] = f"itr/{start + page_size}"
+        self.count("airtable_pages")
+        return 200, page
+
+    def embeddings(self, body):
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        self.count("embedding_requests")
+        self.count("embedding_inputs", len(inputs))
+        data = []
+        for index, text in enumerate(inputs):
+            vector = fake_embedding(text, body.get("dimensions") or self.dimensions)
+            encoded = base64.b64encode(vector.tobytes()).decode("ascii") if body.get("encoding_format") == "base64" else vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": encoded})
+        tokens = sum(len(text.split()) for text in inputs)
+        return 200, {"object": "list", "data": data, "model": body.get("model"), "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def handler_class(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def send(self, status, body, content_type="application/json", headers=()):
+                if content_type == "application/json":
+                    body = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = [part for part in url.path.split("/") if part]
+                if len(parts) == 3 and parts[0] == "v0":
+                    self.send(*services.list_records(parts[1], parts[2].replace("%20", " "), parse_qs(url.query)))
+                elif parts[:1] == ["images"]:
+                    services.count("images")
+                    self.send(200, services.image, "image/png")
+                elif parts[:1] == ["videos"]:
+                    etag = f'"{hashlib.sha256(url.path.encode()).hexdigest()[:16]}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        services.count("videos_not_modified")
+                        self.send(304, b"", "video/mp4", [("ETag", etag)])
+                    else:
+                        services.count("videos")
+                        self.send(200, services.video, "video/mp4", [("ETag", etag)])
+                else:
+                    self.send(404, {"error": "not found"})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if urlparse(self.path).path == "/v1/embeddings":
+                    self.send(*services.embeddings(body))
+                else:
+                    self.send(404, {"error": "not found"})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--airtable-rate", type=float, default=5.0, help="Airtable requests per second per base (0 for no limit)")
+    parser.add_argument("--port", type=int, default=8787)
+    args = parser.parse_args()
+
+    services = MockServices(args.members, args.dimensions, args.airtable_rate, port=args.port).start()
+    print(f"Serving {args.members} members on {services.airtable_base_url} and {services.url}. Run the sync with:")
+    print(f"    AIRTABLE_API_URL={services.airtable_url} OPENAI_BASE_URL={services.openai_url} python get_members.py")
+    try:
+        services.threads[0].join()
+    except KeyboardInterrupt:
+        services.stop()
+
+if __name__ == "__main__":
+    main()
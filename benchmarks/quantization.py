@@ -0,0 +1,49 @@
+"""
+Memory, latency and top-k agreement of the float16/int8 embedding modes against float32.
+
+    python benchmarks/quantization.py --members 200000 --dimensions 1536
+    python benchmarks/quantization.py --data-dir data --rerank 0 200
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_recall import synthetic_members, time_queries  # noqa: E402
+from member_index import PRECISIONS, MemberIndex  # noqa: E402
+from member_store import load_members  # noqa: E402
+from synthetic import queries as synthetic_queries  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", help="Benchmark the member store in this directory instead of synthetic data")
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 200])
+    args = parser.parse_args()
+
+    members = load_members(args.data_dir) if args.data_dir else synthetic_members(args.members, args.dimensions)
+    queries = synthetic_queries(members, args.queries)
+
+    baseline = MemberIndex(members)
+    expected, baseline_ms = time_queries(lambda query: baseline.search(query, args.k), queries)
+    expected_ids = [set(member["id"] for member, _ in result) for result in expected]
+    print(f"{len(baseline)} members, {baseline.embeddings.shape[1]} dims")
+    print(f"{'mode':>16} {'MB':>8} {'overlap@' + str(args.k):>11} {'ms/query':>10}")
+    print(f"{'float32':>16} {baseline.embeddings.nbytes / 2 ** 20:>8.1f} {1.0:>11.3f} {baseline_ms:>10.2f}")
+
+    for precision in PRECISIONS[1:]:
+        for rerank in args.rerank:
+            index = MemberIndex(members, precision=precision, rerank=rerank)
+            size = index.embeddings.nbytes + (index.scales.nbytes if index.scales is not None else 0)
+            results, ms = time_queries(lambda query: index.search(query, args.k), queries)
+            overlap = np.mean([len(ids & set(member["id"] for member, _ in result)) / len(ids) for ids, result in zip(expected_ids, results)])
+            print(f"{precision + ' rerank=' + str(rerank):>16} {size / 2 ** 20:>8.1f} {overlap:>11.3f} {ms:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Build time and payload size of the batched member card and project grid HTML for one results page.
+
+    python benchmarks/render.py --data-dir data
+    python benchmarks/render.py --members 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cards import CardRenderer  # noqa: E402
+from member_lookup import MemberLookup  # noqa: E402
+from member_store import data_version, load_metadata  # noqa: E402
+import synthetic  # noqa: E402
+
+def timed(build, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        html = build()
+    return html, (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", help="Render members from the store in this directory instead of synthetic data")
+    parser.add_argument("--members", type=int, default=20, help="Members on the page")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    members = load_metadata(args.data_dir)[:args.members] if args.data_dir else synthetic.members(args.members, dimensions=8)
+    renderer = CardRenderer(MemberLookup(members), data_version(args.data_dir) if args.data_dir else 0)
+
+    print(f"{'grid':>8} {'KB':>8} {'cold ms':>9} {'memo ms':>9}")
+    for grid, build in (("members", renderer.members_html), ("projects", renderer.projects_html)):
+        renderer.cache.clear()
+        html, cold_ms = timed(lambda: build(members), 1)
+        html, warm_ms = timed(lambda: build(members), args.repeat)
+        print(f"{grid:>8} {len(html.encode('utf-8')) / 1024:>8.1f} {cold_ms:>9.2f} {warm_ms:>9.3f}")
+
+if __name__ == "__main__":
+    main()
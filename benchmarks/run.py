@@ -0,0 +1,281 @@
+"""
+Benchmark suite for the sync and app hot paths, run against synthetic data and local mock
+services (see mock_servers.py) in a scratch workspace. Results are written as JSON so runs can
+be compared with --compare.
+
+    python benchmarks/run.py --scales 1000 10000 --sync-members 1000
+    python benchmarks/run.py --only search render --scales 100000 --dimensions 256
+    python benchmarks/run.py --compare benchmarks/results/<earlier run>.json
+    python benchmarks/run.py --only startup --scales 10000 --startup-budget 2
+
+The run exits with status 1 if a startup run fails or is over the startup budget.
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import ann_index  # noqa: E402
+from dataset import Dataset  # noqa: E402
+import member_store  # noqa: E402
+from mock_servers import MockServices  # noqa: E402
+import synthetic  # noqa: E402
+import teammates  # noqa: E402
+from text_index import reciprocal_rank_fusion  # noqa: E402
+
+BENCHMARKS = ("sync", "load", "startup", "search", "render", "teammates")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+# Seconds from a fresh interpreter to the first page (header, search box, first browse page).
+STARTUP_BUDGET_SECONDS = 2.0
+SECRETS = """[airtable]
+personal_access_token = "benchmark"
+projects_pat = "benchmark"
+
+[openai]
+api_key = "benchmark"
+base_url = "{base_url}"
+"""
+
+def prepare_workspace(path):
+    # The app and the sync use paths relative to the working directory.
+    os.makedirs(os.path.join(path, "member_images"), exist_ok=True)
+    shutil.copy(os.path.join(REPO_DIR, "member_images", "default.png"), os.path.join(path, "member_images", "default.png"))
+    shutil.copy(os.path.join(REPO_DIR, "logo.png"), os.path.join(path, "logo.png"))
+    return path
+
+def run_python(code, cwd, env=None, options=()):
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, *options, "-c", code], cwd=cwd, capture_output=True, text=True,
+                               env={**os.environ, "PYTHONPATH": REPO_DIR, **(env or {})})
+    seconds = time.perf_counter() - start
+    if completed.returncode:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit code {completed.returncode}")
+    return seconds, completed
+
+def latency(function, inputs):
+    timings = []
+    for value in inputs:
+        start = time.perf_counter()
+        function(value)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": float(np.percentile(timings, 50)), "p95_ms": float(np.percentile(timings, 95)), "mean_ms": float(np.mean(timings))}
+
+def timed(function):
+    start = time.perf_counter()
+    value = function()
+    return value, (time.perf_counter() - start) * 1000
+
+def bench_sync(args, workspace):
+    """
+    A full sync into an empty store, then an incremental sync after editing a fraction of members.
+    """
+    results = []
+    workspace = prepare_workspace(os.path.join(workspace, "sync"))
+    with MockServices(args.sync_members, args.dimensions, args.airtable_rate) as services:
+        os.makedirs(os.path.join(workspace, ".streamlit"), exist_ok=True)
+        with open(os.path.join(workspace, ".streamlit", "secrets.toml"), "w") as f:
+            f.write(SECRETS.format(base_url=services.openai_url))
+        env = {"AIRTABLE_API_URL": services.airtable_url}
+
+        for name in ("sync_full", "sync_incremental"):
+            changed = len(services.modify_members(args.changed_fraction)) if name == "sync_incremental" else args.sync_members
+            counters = dict(services.counters)
+            seconds, _ = run_python("from get_members import sync_members; sync_members()", workspace, env)
+            metrics = {"seconds": seconds, "changed_members": changed, "members_per_second": changed / seconds}
+            metrics.update({counter: services.counters[counter] - counters[counter] for counter in counters})
+            results.append({"benchmark": name, "scale": args.sync_members, "metrics": metrics})
+    return results
+
+def write_store(members, data_dir):
+    generation = member_store.new_generation()
+    member_store.write_members(members, data_dir, generation)
+    ann_index.update_index(members, members, generation, data_dir=data_dir)
+    teammates.update_table(members, generation, data_dir)
+    member_store.commit_generation(data_dir, generation)
+
+def bench_load(args, workspace, scale, data_dir):
+    dataset, load_ms = timed(lambda: Dataset(member_store.data_version(data_dir), data_dir, args.precision, args.rerank, args.n_probe))
+    metrics = {"members_ms": load_ms}
+    for name in ("lookup", "member_index", "text_index"):
+        _, metrics[f"{name}_ms"] = timed(lambda: getattr(dataset, name))
+    metrics["total_ms"] = sum(metrics.values())
+    return [{"benchmark": "load", "scale": scale, "metrics": metrics}]
+
+def bench_startup(args, workspace, scale, data_dir):
+    """
+    Imports main.py and renders the first page in a fresh interpreter (Streamlit bare mode), and
+    checks the time to the first page against --startup-budget. Over budget, the slowest imports
+    are reported as well.
+    """
+    env = {"EMBEDDING_PRECISION": args.precision}
+    code = ("import time; start = time.perf_counter(); import main; imported = time.perf_counter(); main.main(); "
+            "print(imported - start, time.perf_counter() - start)")
+    seconds, completed = run_python(code, workspace, env)
+    import_seconds, first_page_seconds = map(float, completed.stdout.strip().splitlines()[-1].split())
+    metrics = {"process_seconds": seconds, "import_seconds": import_seconds, "first_page_seconds": first_page_seconds,
+               "budget_seconds": args.startup_budget, "within_budget": first_page_seconds <= args.startup_budget}
+    if not metrics["within_budget"]:
+        metrics["slowest_imports"] = slowest_imports(workspace, env)
+    return [{"benchmark": "startup", "scale": scale, "metrics": metrics}]
+
+def slowest_imports(workspace, env, limit=8):
+    # Cumulative milliseconds of main's direct imports, from python -X importtime.
+    _, completed = run_python("import main", workspace, env, options=("-X", "importtime"))
+    imports = {}
+    for line in completed.stderr.splitlines():
+        if line.startswith("import time:") and line.count("|") == 2:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit() and name.startswith("   ") and not name.startswith("    "):
+                imports[name.strip()] = int(cumulative) / 1000
+    return dict(sorted(imports.items(), key=lambda item: item[1], reverse=True)[:limit])
+
+def bench_search(args, workspace, scale, data_dir):
+    """
+    Latency of the index calls behind retrieve_and_rank and keyword/hybrid
+    search. Query embeddings are synthetic, so no embedding API is involved.
+    """
+    dataset = Dataset(member_store.data_version(data_dir), data_dir, args.precision, args.rerank, args.n_probe)
+    queries = synthetic.queries(dataset.members, args.queries)
+    texts = [" ".join(np.random.default_rng(row).choice(synthetic.WORDS, 4)) for row in range(args.queries)]
+    member_index, text_index = dataset.member_index, dataset.text_index
+
+    def hybrid(row):
+        semantic = [member for member, _ in member_index.search(queries[row], 100)]
+        lexical = [member for member, _ in text_index.search(texts[row], 100)]
+        return reciprocal_rank_fusion([semantic, lexical])[:20]
+
+    results = [
+        ("retrieve_and_rank", latency(lambda query: member_index.search(query, 20, exact=True), queries)),
+        ("keyword_search", latency(lambda text: text_index.search(text, 20), texts)),
+        ("hybrid_search", latency(hybrid, range(args.queries))),
+    ]
+    if member_index.ann_index is not None:
+        results.append(("retrieve_and_rank_ann", latency(lambda query: member_index.search(query, 20), queries)))
+    return [{"benchmark": name, "scale": scale, "metrics": metrics} for name, metrics in results]
+
+def bench_render(args, workspace, scale, data_dir):
+    dataset = Dataset(member_store.data_version(data_dir), data_dir, args.precision, args.rerank, args.n_probe)
+    page = dataset.lookup.members_at(dataset.permutation(0)[:20])
+    renderer = dataset.card_renderer
+    results = []
+    for name, build in (("render_members", renderer.members_html), ("render_projects", renderer.projects_html)):
+        html, cold_ms = timed(lambda: build(page))
+        _, warm_ms = timed(lambda: build(page))
+        results.append({"benchmark": name, "scale": scale, "metrics": {"cold_ms": cold_ms, "memoized_ms": warm_ms, "payload_bytes": len(html.encode("utf-8"))}})
+    return results
+
+def bench_teammates(args, workspace, scale, data_dir):
+    """
+    The sync-time teammate table build, and suggestion lookups as the member cards do them.
+    """
+    dataset = Dataset(member_store.data_version(data_dir), data_dir, args.precision, args.rerank, args.n_probe)
+    members = dataset.lookup.members
+    open_count = sum(teammates.is_open(member) for member in members)
+    _, compute_ms = timed(lambda: teammates.compute_table(members))
+    table = dataset.teammates
+    rows = np.random.default_rng(0).integers(0, len(members), args.queries)
+    metrics = {"open_members": open_count, "compute_ms": compute_ms, **latency(lambda row: table.suggestions(row, 3), rows)}
+    return [{"benchmark": "teammates", "scale": scale, "metrics": metrics}]
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r") as f:
+        baseline = {(result["benchmark"], result["scale"]): result.get("metrics", {}) for result in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path} (ratio > 1 is slower):")
+    for result in results:
+        previous = baseline.get((result["benchmark"], result["scale"]))
+        if not previous:
+            continue
+        for metric, value in result["metrics"].items():
+            if metric.endswith(("_ms", "seconds")) and previous.get(metric):
+                print(f"  {result['benchmark']:>32} {result['scale']:>8} {metric:>20} {previous[metric]:>10.2f} -> {value:>10.2f} ({value / previous[metric]:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000], help="Roster sizes for the load/startup/search/render benchmarks")
+    parser.add_argument("--sync-members", type=int, default=1000, help="Roster size served by the mock Airtable")
+    parser.add_argument("--changed-fraction", type=float, default=0.05, help="Share of members edited before the incremental sync")
+    parser.add_argument("--airtable-rate", type=float, default=5.0, help="Mock Airtable requests per second per base (0 for no limit)")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--precision", default="float32")
+    parser.add_argument("--rerank", type=int, default=200)
+    parser.add_argument("--n-probe", type=int, default=ann_index.DEFAULT_N_PROBE, help="ANN lists probed per query")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_SECONDS, help="Seconds allowed from a fresh interpreter to the first page")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<UTC time>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare timings against")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc)
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="build-zone-bench-") as workspace:
+        os.chdir(prepare_workspace(workspace))
+        if "sync" in args.only:
+            print(f"sync ({args.sync_members} members)...")
+            results += bench_sync(args, workspace)
+        for scale in args.scales:
+            if not set(args.only) - {"sync"}:
+                break
+            print(f"generating {scale} members...")
+            write_store(synthetic.members(scale, args.dimensions), member_store.DATA_DIR)
+            for name, benchmark in (("load", bench_load), ("startup", bench_startup), ("search", bench_search),
+                                    ("render", bench_render), ("teammates", bench_teammates)):
+                if name not in args.only:
+                    continue
+                print(f"{name} ({scale} members)...")
+                try:
+                    results += benchmark(args, workspace, scale, member_store.DATA_DIR)
+                except Exception as error:
+                    print(f"  {name} failed: {error!r}")
+                    results.append({"benchmark": name, "scale": scale, "error": repr(error)})
+            shutil.rmtree(member_store.DATA_DIR)
+        os.chdir(cwd)
+
+    for result in results:
+        metrics = ", ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}" for key, value in result.get("metrics", {}).items())
+        print(f"{result['benchmark']:>32} {result['scale']:>8}  {metrics or result.get('error')}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {"started_at": started_at.isoformat(), "commit": git_commit(), "python": platform.python_version(),
+                     "numpy": np.__version__, "platform": platform.platform(), "cpus": os.cpu_count(), "args": vars(args)},
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+    # A startup run that crashed has no timing to check, so it fails the budget too.
+    over_budget = [result for result in results if result["benchmark"] == "startup" and not result.get("metrics", {}).get("within_budget")]
+    for result in over_budget:
+        if "error" in result:
+            print(f"Startup at {result['scale']} members failed: {result['error']}")
+        else:
+            print(f"Startup at {result['scale']} members took {result['metrics']['first_page_seconds']:.2f}s, over the {args.startup_budget:.2f}s budget.")
+    if over_budget:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
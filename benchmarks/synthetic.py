@@ -0,0 +1,98 @@
+"""
+Deterministic synthetic rosters: raw Airtable member/project records (for the mock Airtable) and
+processed member records with embeddings and build updates (for the member store).
+"""
+from datetime import datetime, timedelta, timezone
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SKILLS = ["AI Engineer", "Backend Engineer", "Frontend Engineer", "GTM", "Generalist", "Product manager", "Designer",
+          "Domain expert", "IOS/App", "RAG", "DevTools", "Opensource", "Image/Multi-madel", "Ai Agents"]
+CITIES = ["London", "San Francisco", "New York", "Berlin", "Paris", "Bangalore", "Sydney", "Toronto", "Lagos", "Singapore"]
+WORDS = ("agent retrieval evaluation pipeline startup climate health education fintech robotics vision speech "
+         "compiler database search ranking latency privacy security design growth community marketplace").split()
+CREATED_AT = datetime(2024, 5, 1, tzinfo=timezone.utc)
+TEAM_SIZE = 3
+
+def record_id(prefix, number):
+    return f"rec{prefix}{number:012d}"
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS, words)).capitalize() + "."
+
+def airtable_records(count, seed=0, base_url="https://media.example.com", projects_share=0.6):
+    """
+    Returns (member records, project records) shaped like the Airtable API's. About projects_share
+    of members are in a project of TEAM_SIZE; attachments and demos point at base_url.
+    """
+    rng = np.random.default_rng(seed)
+    members, projects = [], []
+    team_count = int(count * projects_share) // TEAM_SIZE
+    for number in range(count):
+        members.append({
+            "id": record_id("M", number),
+            "createdTime": (CREATED_AT + timedelta(minutes=number)).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "fields": {
+                "Name": f"Member {number}",
+                "Email": f"member{number}@example.com",
+                "Profile picture": [{"url": f"{base_url}/images/{number}.png"}],
+                "Bio: Current professional role and why you want to enter": sentence(rng, 30),
+                "What's the link to your LinkedIn?": f"https://www.linkedin.com/in/member{number}",
+                "Twitter": "",
+                "What are your areas of expertise and interest?": sorted(set(map(str, rng.choice(SKILLS, 3)))),
+                "Team or individual entry type": "Team" if number < team_count * TEAM_SIZE else "Individual",
+                "Looking for more team members?": str(rng.choice(["Yes", "No"])),
+                "Dietary requirements": "",
+                "Which City are you participating from?": str(rng.choice(CITIES)),
+            },
+        })
+    for team in range(team_count):
+        emails = [members[team * TEAM_SIZE + offset]["fields"]["Email"] for offset in range(TEAM_SIZE)]
+        projects.append({
+            "id": record_id("P", team),
+            "createdTime": CREATED_AT.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "fields": {
+                "Team name": f"Project {team}",
+                "Team members": ", ".join(members[team * TEAM_SIZE + offset]["fields"]["Name"] for offset in range(TEAM_SIZE)),
+                "Team member emails (separate by comma)": ", ".join(emails),
+                "City": str(rng.choice(CITIES)),
+                "2-3 sentence overview of build": sentence(rng, 40),
+                "Link to recorded demo (City Finals)": f"{base_url}/videos/{team}.mp4",
+                "Link to github or platform sharable link e.g., Relevance AI URL, Github repo": f"https://github.com/example/project{team}",
+            },
+        })
+    return members, projects
+
+def clustered_embeddings(count, dimensions, clusters=256, seed=0):
+    # Clustered vectors resemble real embeddings far better than uniform noise does.
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimensions)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    return centres[labels] + 0.6 * rng.normal(size=(count, dimensions)).astype(np.float32)
+
+def members(count, dimensions=1536, seed=0):
+    """
+    Processed member records as the sync writes them, with clustered embeddings.
+    """
+    from get_members import build_member_data, build_project_index
+
+    member_records, project_records = airtable_records(count, seed)
+    project_index = build_project_index(project_records)
+    embeddings = clustered_embeddings(count, dimensions, seed=seed)
+
+    processed = []
+    for row, record in enumerate(member_records):
+        member = build_member_data(record, project_index, {})
+        member["combined_embedding"] = embeddings[row]
+        processed.append(member)
+    return processed
+
+def queries(members, count, seed=1, noise=0.1):
+    # Perturbed member embeddings stand in for query embeddings near real content.
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(members), count)
+    return [members[row]["combined_embedding"] + noise * rng.normal(size=len(members[row]["combined_embedding"])) for row in rows]
@@ -0,0 +1,171 @@
+from collections import OrderedDict
+from html import escape
+import re
+import threading
+from urllib.parse import parse_qs, urlparse
+
+from avatars import avatar_data_uri
+from teammates import is_open
+
+CACHE_ENTRIES = 4096
+SUGGESTED_TEAMMATES = 3
+
+URL_PATTERN = re.compile(
+    r'^(?:http|ftp)s?://' # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|' # domain...
+    r'localhost|' # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}|' # ...or ipv4
+    r'\[?[A-F0-9]*:[A-F0-9:]+\]?)' # ...or ipv6
+    r'(?::\d+)?' # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+MEMBER_CARD = """<div class='member-card'>
+<div class='image-container'>{image}</div>
+<div class='member-details'>
+<p class='member-name'><strong>{name}</strong></p>
+<p>{skills}</p>
+<p><strong>Bio:</strong> {bio}</p>
+{team_members}<p><strong>Looking for Team Members:</strong> {looking_for_team_members}</p>
+{city}{suggestions}</div>
+</div>
+<hr>"""
+
+PROJECT_CARD = """<div class='project-card'>
+<p><strong>{name}</strong></p>
+<p>{overview}</p>
+{team_members}<p><strong>City:</strong> {city}</p>
+{demo}
+<p><strong>GitHub:</strong> {github}</p>
+<hr>
+</div>"""
+
+def is_valid_url(url):
+    return URL_PATTERN.match(url or "") is not None
+
+def text(value):
+    return escape(str(value or "").encode("utf-8", "ignore").decode("utf-8")).replace("\n", "<br>")
+
+def video_embed(url, content_type=None):
+    """
+    HTML for a demo link: an embedded player for YouTube/Loom and video files, otherwise a link.
+    """
+    parsed = urlparse(url)
+    host = parsed.netloc.lower().removeprefix("www.")
+    video_id = None
+    if host in ("youtube.com", "m.youtube.com"):
+        video_id = parse_qs(parsed.query).get("v", [None])[0]
+    elif host == "youtu.be":
+        video_id = parsed.path.strip("/")
+    if video_id:
+        return f"<iframe class='demo-video' src='https://www.youtube.com/embed/{escape(video_id)}' allowfullscreen></iframe>"
+    if host == "loom.com" and parsed.path.startswith("/share/"):
+        return f"<iframe class='demo-video' src='https://www.loom.com/embed/{escape(parsed.path[len('/share/'):])}' allowfullscreen></iframe>"
+    if (content_type or "").startswith("video/"):
+        return f"<video class='demo-video' src='{escape(url)}' controls preload='none'></video>"
+    return f"<p><a href='{escape(url)}' target='_blank'>{text(url)}</a></p>"
+
+class CardRenderer:
+    """
+    Renders member cards and project grids as single HTML blocks, so a results page is one
+    Streamlit element instead of several per member. Cards are memoized per (id, data version).
+    With a teammates.TeammateTable, cards of members looking for a team list suggested teammates.
+    """
+
+    def __init__(self, lookup, version, teammates=None, max_entries=CACHE_ENTRIES):
+        self.lookup = lookup
+        self.version = version
+        self.teammates = teammates
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def cached(self, key, render):
+        key = (*key, self.version)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        html = render()
+        with self.lock:
+            self.cache[key] = html
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return html
+
+    def member_card(self, member):
+        return self.cached(("member", member["id"]), lambda: self.render_member_card(member))
+
+    def render_member_card(self, member):
+        profile_image = avatar_data_uri(member["profile_picture"], "card")
+        linkedin_url = member.get("linkedin_url", "")
+        twitter_url = member.get("twitter_url", "")
+        # Use Twitter URL if LinkedIn URL is not provided or invalid
+        url = linkedin_url if is_valid_url(linkedin_url) else (twitter_url if is_valid_url(twitter_url) else "")
+
+        name = text(member["name"])
+        team_members = [text(name) for name in self.lookup.team_member_names(member)]
+        return MEMBER_CARD.format(
+            image=f"<img src='{profile_image}'>" if profile_image else "",
+            name=f"<a class='linkedin_link' href='{escape(url)}'>{name}</a>" if url else name,
+            skills="".join(f"<span class='skill-chip'>{text(skill)}</span>" for skill in member.get("areas_of_expertise") or []),
+            bio=text(member.get("bio")),
+            team_members=f"<p><strong>Team Members:</strong> {', '.join(team_members)}</p>\n" if team_members else "",
+            looking_for_team_members=text(member.get("looking_for_team_members")),
+            city=f"<p><strong>City:</strong> {text(member['city'])}</p>\n" if member.get("city") else "",
+            suggestions=self.suggestions_html(member),
+        )
+
+    def suggestions_html(self, member):
+        if self.teammates is None or not is_open(member) or member["id"] not in self.lookup.row_by_id:
+            return ""
+        suggestions = self.teammates.suggestions(self.lookup.row_by_id[member["id"]], SUGGESTED_TEAMMATES)
+        if not suggestions:
+            return ""
+        names = ", ".join(text(teammate["name"]) + (f" ({text(teammate['city'])})" if teammate.get("city") else "") for teammate, _ in suggestions)
+        return f"<p><strong>Suggested teammates:</strong> {names}</p>\n"
+
+    def members_html(self, members):
+        cards = []
+        for member in members:
+            if not isinstance(member, dict) or "profile_picture" not in member:
+                print("Skipping member: No profile picture found.")
+                continue
+            cards.append(self.member_card(member))
+        return "".join(cards)
+
+    def project_card(self, member):
+        return self.cached(("project", member["id"]), lambda: self.render_project_card(member))
+
+    def render_project_card(self, member):
+        project_details = member["project_details"]
+        demo_link = project_details.get("Demo", "")
+        if demo_link and demo_link.startswith("https:"):
+            demo = video_embed(demo_link, (member.get("video") or {}).get("content_type"))
+        else:
+            demo = "<p><strong>Demo Link:</strong> Not available</p>"
+        return PROJECT_CARD.format(
+            name=text(project_details.get("Name")),
+            overview=text(project_details.get("Overview")),
+            team_members=f"<p><strong>Team Members:</strong> {text(project_details['Team members'])}</p>\n" if project_details.get("Team members") else "",
+            city=text(project_details.get("City")),
+            demo=demo,
+            github=text(project_details.get("Github")),
+        )
+
+    def projects_html(self, members):
+        """
+        The grid of projects with a demo link, two per row, for the given members.
+        """
+        cards = []
+        for member in members:
+            if not isinstance(member, dict) or "project_details" not in member:
+                print("Skipping member: No project details found.")
+                continue
+            project_details = member["project_details"]
+            if not isinstance(project_details, dict):
+                print(f"Skipping member: project_details is not a dictionary: {project_details}")
+                continue
+            demo_link = project_details.get("Demo", "").strip()
+            if demo_link and demo_link.startswith("https:"):
+                cards.append(self.project_card(member))
+        return f"<div class='project-grid'>{''.join(cards)}</div>"
@@ -0,0 +1,118 @@
+import threading
+
+import numpy as np
+
+import ann_index
+from cards import CardRenderer
+from member_index import MemberIndex
+from member_lookup import MemberLookup
+from member_store import DATA_DIR, current_generation, data_version, load_members, load_search_embeddings
+from teammates import TeammateTable, read_table
+from text_index import TextIndex
+
+class Dataset:
+    """
+    One immutable snapshot of the member store and the indexes over it, shared by every session.
+    Every file the snapshot reads is opened (embeddings memory-mapped) when it is created, so a
+    later sync can't mix into it; indexes are built from them on first use, or ahead of it by
+    warm(). Sessions order members with row permutations instead of reordering the shared data.
+    """
+
+    def __init__(self, version, data_dir=DATA_DIR, precision="float32", rerank=0, n_probe=ann_index.DEFAULT_N_PROBE, ann=True):
+        self.version = version
+        self.data_dir = data_dir
+        self.precision = precision
+        self.rerank = rerank
+        self.n_probe = n_probe
+        self.generation = current_generation(data_dir)
+        self.members = tuple(load_members(data_dir, generation=self.generation))
+        self.search_embeddings = load_search_embeddings(precision, data_dir, generation=self.generation)
+        # With ann=False every search is an exact scan, even if the store has an index.
+        self.ann_index = ann_index.load_index(data_dir, self.generation) if ann else None
+        self.saved_teammates = read_table(data_dir, self.generation)
+        self.resources = {}
+        self.resource_locks = {}
+        self.warming = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.members)
+
+    def resource(self, name, build):
+        # One lock per resource, so a page that needs the lookup doesn't wait for an index being warmed.
+        with self.lock:
+            lock = self.resource_locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self.resources:
+                self.resources[name] = build()
+            return self.resources[name]
+
+    def warm(self, names):
+        """
+        Builds the named resources in a background thread, once per snapshot, so the first request
+        that needs them doesn't wait for them.
+        """
+        with self.lock:
+            if self.warming is None:
+                self.warming = threading.Thread(target=lambda: [getattr(self, name) for name in names], daemon=True)
+                self.warming.start()
+            return self.warming
+
+    @property
+    def lookup(self):
+        return self.resource("lookup", lambda: MemberLookup(self.members))
+
+    @property
+    def member_index(self):
+        return self.resource("member_index", lambda: MemberIndex(
+            self.members, ann_index=self.ann_index, n_probe=self.n_probe, precision=self.precision,
+            rerank=self.rerank, normalized=self.search_embeddings))
+
+    @property
+    def text_index(self):
+        return self.resource("text_index", lambda: TextIndex(self.members))
+
+    @property
+    def teammates(self):
+        return self.resource("teammates", lambda: TeammateTable.from_saved(self.lookup.members, self.saved_teammates))
+
+    @property
+    def card_renderer(self):
+        return self.resource("card_renderer", lambda: CardRenderer(self.lookup, self.version, self.teammates))
+
+    def permutation(self, seed):
+        return np.random.default_rng(seed).permutation(len(self.lookup))
+
+class DatasetLoader:
+    """
+    Hands out the current Dataset, loading a new one when a sync rewrites the store. If the new
+    store can't be loaded (e.g. it is mid-write), the previous snapshot keeps being served.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, precision="float32", rerank=0, n_probe=ann_index.DEFAULT_N_PROBE, ann=True):
+        self.data_dir = data_dir
+        self.precision = precision
+        self.rerank = rerank
+        self.n_probe = n_probe
+        self.ann = ann
+        self.dataset = None
+        self.failed_version = None
+        self.lock = threading.Lock()
+
+    def current(self):
+        version = data_version(self.data_dir)
+        dataset = self.dataset
+        if dataset is not None and version in (dataset.version, self.failed_version):
+            return dataset
+        with self.lock:
+            if self.dataset is None or self.dataset.version != version:
+                try:
+                    self.dataset = Dataset(version, self.data_dir, self.precision, self.rerank, self.n_probe, self.ann)
+                except (OSError, ValueError) as error:
+                    if self.dataset is None:
+                        raise
+                    print(f"Keeping member data version {self.dataset.version}, failed to load {version}: {error!r}")
+                    self.failed_version = version
+                else:
+                    print(f"Loaded member data version {version} ({len(self.dataset)} members).")
+            return self.dataset
@@ -0,0 +1,117 @@
+from collections import OrderedDict
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+CACHE_PATH = os.path.join("data", "embedding_cache.sqlite")
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+def cache_key(model, text):
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by model + normalized-text hash.
+
+    A small in-process LRU sits in front of a size-bounded SQLite table; when the table grows past
+    max_entries the least recently used rows are evicted.
+    """
+
+    def __init__(self, path=CACHE_PATH, memory_entries=1024, max_entries=200000):
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_used REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.connection.commit()
+        self.disk_entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def remember(self, key, embedding):
+        self.memory[key] = embedding
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model, texts):
+        """
+        Returns a list aligned with texts holding the cached embedding or None for each text.
+        """
+        keys = [cache_key(model, text) for text in texts]
+        results = [None] * len(texts)
+        with self.lock:
+            disk_keys = []
+            for position, key in enumerate(keys):
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    results[position] = self.memory[key]
+                    self.counters["memory_hits"] += 1
+                else:
+                    disk_keys.append(key)
+
+            found = {}
+            for start in range(0, len(disk_keys), 500):
+                chunk = disk_keys[start:start + 500]
+                rows = self.connection.execute(f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                found.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+            if found:
+                now = time.time()
+                self.connection.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+                self.connection.commit()
+
+            for position, key in enumerate(keys):
+                if results[position] is not None:
+                    continue
+                if key in found:
+                    results[position] = found[key]
+                    self.remember(key, found[key])
+                    self.counters["disk_hits"] += 1
+                else:
+                    self.counters["misses"] += 1
+        return results
+
+    def put_many(self, model, texts, embeddings):
+        now = time.time()
+        rows = []
+        with self.lock:
+            for text, embedding in zip(texts, embeddings):
+                key = cache_key(model, text)
+                embedding = np.asarray(embedding, dtype=np.float32)
+                self.remember(key, embedding)
+                rows.append((key, embedding.tobytes(), now))
+            cursor = self.connection.executemany("INSERT OR REPLACE INTO embeddings (key, embedding, last_used) VALUES (?, ?, ?)", rows)
+            self.disk_entries += max(cursor.rowcount, 0)
+            if self.disk_entries > self.max_entries:
+                self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        # Trim to 90% of the bound so eviction doesn't run on every insert.
+        self.disk_entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self.disk_entries - int(self.max_entries * 0.9)
+        if excess > 0:
+            self.connection.execute("DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,))
+            self.disk_entries -= excess
+            self.counters["evictions"] += excess
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            return {**self.counters, "hit_rate": hits / lookups if lookups else 0.0,
+                    "memory_entries": len(self.memory), "disk_entries": self.disk_entries}
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,107 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import httpx
+import numpy as np
+from openai import OpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from ingest_pipeline import backoff_delay
+import metrics
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Limits of the embeddings endpoint: inputs per request, tokens per request and tokens per input.
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300000
+MAX_TOKENS_PER_INPUT = 8191
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+def estimate_tokens(text):
+    # Conservative estimate (English averages ~4 characters per token) so batches never overshoot the limits.
+    return len(text) // 3 + 1
+
+def batch_texts(texts, max_inputs=MAX_INPUTS_PER_REQUEST, max_tokens=MAX_TOKENS_PER_REQUEST):
+    """
+    Splits texts into batches that fit within the per-request input and token limits.
+    """
+    batch = []
+    batch_tokens = 0
+    for text in texts:
+        tokens = min(estimate_tokens(text), MAX_TOKENS_PER_INPUT)
+        if batch and (len(batch) >= max_inputs or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+class EmbeddingService:
+    """
+    Shared embeddings client: one pooled HTTP connection pool, batched requests,
+    a cap on in-flight requests and retry with backoff on rate limits and transient errors.
+    With a cache (see embedding_cache.EmbeddingCache) only texts not embedded before are sent.
+    """
+
+    def __init__(self, api_key, model=EMBEDDING_MODEL, base_url=None, max_concurrency=4, max_retries=6, timeout=60.0, cache=None):
+        self.model = model
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        http_client = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout, http_client=http_client)
+
+    def embed(self, text):
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts):
+        if self.cache is None:
+            return self.request_embeddings(texts)
+
+        embeddings = self.cache.get_many(self.model, texts)
+        misses = sum(embedding is None for embedding in embeddings)
+        metrics.count("embedding_cache.hits", len(texts) - misses)
+        metrics.count("embedding_cache.misses", misses)
+        missing_texts = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing_texts:
+            fetched = dict(zip(missing_texts, self.request_embeddings(missing_texts)))
+            self.cache.put_many(self.model, missing_texts, [fetched[text] for text in missing_texts])
+            embeddings = [fetched[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+        return embeddings
+
+    def request_embeddings(self, texts):
+        batches = list(batch_texts(texts))
+        if len(batches) <= 1:
+            return [embedding for batch in batches for embedding in self.embed_batch(batch)]
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            results = executor.map(self.embed_batch, batches)
+            return [embedding for batch_embeddings in results for embedding in batch_embeddings]
+
+    def embed_batch(self, batch):
+        metrics.count("embeddings.inputs", len(batch))
+        metrics.count("embeddings.estimated_tokens", sum(estimate_tokens(text) for text in batch))
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.semaphore, metrics.span("embeddings.request"):
+                    response = self.client.embeddings.create(input=batch, model=self.model)
+                return [np.asarray(item.embedding, dtype=np.float32) for item in sorted(response.data, key=lambda item: item.index)]
+            except RETRYABLE_ERRORS as error:
+                if attempt == self.max_retries:
+                    raise
+                response = getattr(error, "response", None)
+                delay = backoff_delay(attempt, response.headers.get("retry-after") if response is not None else None,
+                                      base_delay=1.0, max_delay=60.0)
+                metrics.count("embeddings.retries")
+                print(f"Embedding request failed ({type(error).__name__}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    def close(self):
+        self.client.close()
@@ -1,11 +1,25 @@
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from datetime import datetime, timedelta, timezone
+import time
+import hashlib
 import json
 import os
-import requests
 import streamlit as st
-from openai import OpenAI
-import base64
 import re
+import threading
+from urllib.parse import urlsplit
+from embeddings import EmbeddingService
+from embedding_cache import EmbeddingCache
+import member_store
+import ann_index
+import teammates
+from media import MediaStore, video_details
+from ingest_pipeline import DEFAULT_HOST_LIMITS, HostLimitedClient, IngestPipeline, Spool
+from airtable_reader import MEMBER_FIELDS, Checkpoint, aiter_pages
+import metrics
+
+_embedding_service = None
+_embedding_service_lock = threading.Lock()
 
 def is_valid_url(url):
     """
@@ -14,109 +28,290 @@ def is_valid_url(url):
     url_pattern = r'^https?://'  # Regular expression pattern for valid URL scheme
     return bool(re.match(url_pattern, url))
 
-def get_records(table_name="Members", view_name=None):
-    print(f"Retrieving {table_name.lower()}...")
-    access_token = st.secrets["airtable"]["personal_access_token"]
-    url = f"https://api.airtable.com/v0/appdxzy7MxhBwI8WY/{table_name}"
-    headers = {"Authorization": f"Bearer {access_token}"}
+# Overridable so a sync can run against a local mock of the Airtable API.
+AIRTABLE_API_URL = os.environ.get("AIRTABLE_API_URL", "https://api.airtable.com/v0")
+# Airtable's rate limit applies to whichever host the API is served from.
+AIRTABLE_HOST_LIMITS = {urlsplit(AIRTABLE_API_URL).netloc: DEFAULT_HOST_LIMITS["api.airtable.com"]}
+MEMBERS_BASE_ID = "appdxzy7MxhBwI8WY"
+SYNC_CHECKPOINT_PATH = os.path.join(member_store.DATA_DIR, "sync_checkpoint.json")
+SYNC_SPOOL_PATH = os.path.join(member_store.DATA_DIR, "sync_spool.jsonl")
+SYNC_REPORTS_DIR = os.path.join(member_store.DATA_DIR, "sync_reports")
+PROFILES_DIR = os.path.join(member_store.DATA_DIR, "profiles")
+# Airtable rejects very long formulas, so record id lookups are split into chunks.
+RECORD_IDS_PER_FORMULA = 100
+# Margin for clock skew between us and Airtable when moving the sync watermark.
+SYNC_WATERMARK_SKEW = timedelta(minutes=5)
+
+def members_table_url(table_name="Members"):
+    return f"{AIRTABLE_API_URL}/{MEMBERS_BASE_ID}/{table_name}"
+
+def members_table_headers():
+    return {"Authorization": f"Bearer {st.secrets['airtable']['personal_access_token']}"}
+
+def record_params(view_name=None, formula=None, fields=None):
     params = {} if view_name is None else {"view": view_name}
+    if formula:
+        params["filterByFormula"] = formula
+    if fields:
+        params["fields[]"] = fields
+    return params
+
+async def list_records(client, url, headers, params):
     items = []
-    while True:
-        res = requests.get(url, headers=headers, params=params).json()
-        items += res.get("records", [])
-        if "offset" not in res:
-            break
-        params["offset"] = res["offset"]
+    async for records, _ in aiter_pages(client, url, headers, [params]):
+        items += records
     return items
 
-def get_projects(table_name="Table%201", view_name=None):
+@metrics.timed("airtable.get_records")
+async def get_records(client, table_name="Members", view_name=None, formula=None, fields=None):
+    print(f"Retrieving {table_name.lower()}...")
+    return await list_records(client, members_table_url(table_name), members_table_headers(), record_params(view_name, formula, fields))
+
+@metrics.timed("airtable.get_projects")
+async def get_projects(client, table_name="Table%201", view_name=None):
     print(f"Retrieving {table_name.lower()}...")
     access_token = st.secrets["airtable"]["projects_pat"]
-    url = f"https://api.airtable.com/v0/appiKSYuNfWfcwigQ/Table%201?view=all"
+    url = f"{AIRTABLE_API_URL}/appiKSYuNfWfcwigQ/{table_name}"
     headers = {"Authorization": f"Bearer {access_token}"}
-    params = {"view": view_name} if view_name else {}
-    items = []
+    return await list_records(client, url, headers, record_params(view_name))
 
-    while True:
-        res = requests.get(url, headers=headers, params=params).json()
-        items += res.get("records", [])
+def parse_team_emails(team_emails):
+    return [email.strip().lower() for email in team_emails.split(",") if email.strip()]
 
-        if "offset" not in res:
-            break
+def build_project_index(projects):
+    project_index = {}
+    for project in projects:
+        team_emails = project["fields"].get("Team member emails (separate by comma)", "")
+        for email in parse_team_emails(team_emails):
+            project_index.setdefault(email, project)
+    return project_index
 
-        params["offset"] = res["offset"]
+def get_embedding_service():
+    global _embedding_service
+    with _embedding_service_lock:
+        if _embedding_service is None:
+            openai_secrets = st.secrets["openai"]
+            # base_url can point at a local fake embeddings server (OPENAI_BASE_URL is also honoured).
+            _embedding_service = EmbeddingService(
+                api_key=openai_secrets["api_key"],
+                base_url=openai_secrets.get("base_url") or os.environ.get("OPENAI_BASE_URL"),
+                cache=EmbeddingCache(),
+            )
+    return _embedding_service
 
-    return items
+def embedding_cache_stats():
+    # None until the embedding service has been used in this process.
+    service = _embedding_service
+    return service.cache.stats() if service is not None and service.cache is not None else None
 
+def find_member_project(member, project_index):
+    return project_index.get(member["fields"].get("Email", "").strip().lower())
+
+def find_video_url(member, project_index):
+    member_project = find_member_project(member, project_index)
+    video_url = member_project["fields"].get('Link to recorded demo (City Finals)', '') if member_project else ''
+    return video_url if is_valid_url(video_url) else None
+
+@metrics.timed("embeddings.create_embedding")
 def create_embedding(text):
-    client = OpenAI(api_key=st.secrets["openai"]["api_key"])
-    response = client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    return response.data[0].embedding
-
-def save_member_image(member):
-    member_fields = member["fields"]
-    image_url = member_fields.get("Profile picture", [{}])[0].get("url")
-
-    if image_url:
-        image_path = os.path.join("member_images", f"{member['id']}.png")
-        if not os.path.exists(image_path):
-            image_response = requests.get(image_url)
-            if image_response.ok:
-                with open(image_path, "wb") as image_file:
-                    image_file.write(image_response.content)
-                member["profile_image"] = image_path
-            else:
-                print(f"Failed to download image for member ID {member['id']}")
-                member["profile_image"] = ""
+    return get_embedding_service().embed(text)
+
+@metrics.timed("embeddings.create_embeddings")
+def create_embeddings(texts):
+    return get_embedding_service().embed_many(texts)
+
+def embed_members(members_to_embed):
+    texts = [embedding_text(member) for member in members_to_embed]
+    for member, embedding in zip(members_to_embed, create_embeddings(texts)):
+        member["combined_embedding"] = embedding
+
+def embedding_text(member):
+    return f"{member['member_text_representation']} {member['project_text_representation']}"
+
+def reuse_embeddings(processed_members, existing_members_by_id):
+    """
+    Copies the stored embedding onto members whose text representation hasn't changed.
+    Returns the members that still need embedding.
+    """
+    members_to_embed = []
+    for member in processed_members:
+        existing_member = existing_members_by_id.get(member["id"])
+        if existing_member and existing_member.get("combined_embedding") is not None and embedding_text(existing_member) == embedding_text(member):
+            member["combined_embedding"] = existing_member["combined_embedding"]
         else:
-            print(f"Image file already exists for member ID {member['id']}")
-            member["profile_image"] = ""
-    else:
-        member["profile_image"] = ""
-
-def save_members(new_members_to_process):
-    if new_members_to_process:
-        existing_members = []
-        if os.path.exists("members.py"):
-            with open("members.py", "r") as f:
-                try:
-                    members_file = f.read()
-                    members_dict = {}
-                    exec(members_file, members_dict)
-                    existing_members = members_dict.get("members", [])
-                except (SyntaxError, NameError):
-                    pass
-
-        existing_members.extend(new_members_to_process)
-
-        with open("members.py", "w") as f:
-            f.write("members = ")
-            json.dump(existing_members, f, indent=4, default=lambda x: "" if x is None else x)
-
-        print(f"New members added to file: {len(new_members_to_process)}")
-    else:
-        print("No new members to process.")
-
-def find_new_members(updated_members, existing_members_ids):
-    new_members_to_process = [member for member in updated_members if member["id"] not in existing_members_ids]
-    return new_members_to_process
-
-def process_member(member, current_index, total_members):
-    if "Name" not in member["fields"] or not member["fields"]["Name"]:
-        print(f"Skipping member with ID {member['id']} as their name is missing.")
-        return ""
-
-    save_member_image(member)
+            members_to_embed.append(member)
+    return members_to_embed
+
+def save_members(existing_members, changed_members, deleted_ids):
+    if not changed_members and not deleted_ids:
+        print("No member changes to save.")
+        return
+
+    members_by_id = {member["id"]: member for member in existing_members}
+    for member_id in deleted_ids:
+        members_by_id.pop(member_id, None)
+    for member in changed_members:
+        members_by_id[member["id"]] = member
+
+    all_members = list(members_by_id.values())
+    generation = member_store.new_generation()
+    member_store.write_members(all_members, member_store.DATA_DIR, generation)
+    ann_index.update_index(all_members, changed_members, generation, deleted_ids)
+    with metrics.span("teammates.update_table"):
+        teammates.update_table(all_members, generation)
+    member_store.commit_generation(member_store.DATA_DIR, generation)
+    print(f"Members saved: {len(changed_members)} added or updated, {len(deleted_ids)} deleted.")
+
+def fields_hash(record):
+    return hashlib.sha256(json.dumps(record["fields"], sort_keys=True).encode("utf-8")).hexdigest()
+
+def airtable_timestamp(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+def find_changed_records(records, record_hashes):
+    return [record for record in records if record_hashes.get(record["id"], {}).get("fields_hash") != fields_hash(record)]
+
+def find_members_of_projects(projects, existing_members, deleted_project_ids=()):
+    project_ids = set(project["id"] for project in projects) | set(deleted_project_ids)
+    emails = set(email for project in projects for email in parse_team_emails(project["fields"].get("Team member emails (separate by comma)", "")))
+    return set(member["id"] for member in existing_members
+               if member.get("project_id") in project_ids or member.get("email", "").strip().lower() in emails)
+
+def changed_member_formulas(since, extra_member_ids):
+    """
+    Formulas selecting member records modified after `since` (all records if None) plus the given record ids.
+    """
+    if since is None:
+        return [None]
+
+    formulas = [f"IS_AFTER(LAST_MODIFIED_TIME(), '{since}')"]
+    extra_member_ids = sorted(extra_member_ids)
+    for start in range(0, len(extra_member_ids), RECORD_IDS_PER_FORMULA):
+        chunk = extra_member_ids[start:start + RECORD_IDS_PER_FORMULA]
+        # Records modified since the watermark are already covered by the first formula.
+        formulas.append(f"AND(NOT(IS_AFTER(LAST_MODIFIED_TIME(), '{since}')), OR(" + ",".join(f"RECORD_ID()='{member_id}'" for member_id in chunk) + "))")
+    return formulas
+
+def sync_members(report_dir=SYNC_REPORTS_DIR):
+    """
+    Runs apply_member_changes and writes a JSON report of the run (outcome, member counts,
+    timing spans, counters and embedding cache stats) to report_dir. Returns the report path.
+    """
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    report = {"started_at": started_at.isoformat()}
+    try:
+        report.update(asyncio.run(apply_member_changes()))
+        report["status"] = "ok"
+    except BaseException as error:
+        report.update(status="failed", error=repr(error))
+        raise
+    finally:
+        report["duration_seconds"] = time.perf_counter() - start
+        report["metrics"] = metrics.metrics.snapshot()
+        report["embedding_cache"] = embedding_cache_stats()
+        report_path = os.path.join(report_dir, f"sync_{started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+        metrics.write_report(report_path, report)
+        print(f"Sync report written to {report_path}")
+    return report_path
+
+async def apply_member_changes():
+    """
+    Applies Airtable changes since the last sync: processes new and edited members (and members
+    whose project changed), re-embeds only changed text and removes deleted members.
+    Returns a summary of the run for the sync report.
+    """
+    # One client for the listings and the pipeline, so they share the Airtable rate limit.
+    client = HostLimitedClient(AIRTABLE_HOST_LIMITS)
+    try:
+        return await sync_changes(client)
+    finally:
+        await client.aclose()
+
+async def sync_changes(client):
+    sync_started_at = datetime.now(timezone.utc)
+    sync_state = member_store.load_sync_state()
+    existing_members = member_store.load_members(mmap_mode=None)
+    existing_members_by_id = {member["id"]: member for member in existing_members}
+
+    projects = await get_projects(client)
+    changed_projects = find_changed_records(projects, {project_id: {"fields_hash": project_hash} for project_id, project_hash in sync_state["projects"].items()})
+    deleted_project_ids = set(sync_state["projects"]) - set(project["id"] for project in projects)
+    # Members of changed or deleted projects need reprocessing even if their own record is unchanged.
+    affected_member_ids = find_members_of_projects(changed_projects, existing_members, deleted_project_ids)
+    affected_member_ids |= set(sync_state.get("retry_member_ids", []))
+
+    current_member_ids = set(record["id"] for record in await get_records(client, "Members", fields=["Name"]))
+    deleted_ids = set(existing_members_by_id) - current_member_ids
+    member_hashes = sync_state["members"]
+    queries = [record_params(formula=formula, fields=MEMBER_FIELDS) for formula in changed_member_formulas(sync_state["members_synced_at"], affected_member_ids)]
+    checkpoint = Checkpoint(SYNC_CHECKPOINT_PATH, members_table_url(), queries, started_at=sync_started_at.isoformat())
+    # A resumed sync doesn't re-read the pages finished before the interruption, so edits made
+    # since then are only picked up next time if the watermark is the interrupted run's start.
+    sync_started_at = datetime.fromisoformat(checkpoint.started_at)
+    spool = Spool(SYNC_SPOOL_PATH)
+    nameless_records = [entry["record"] for entry in spool.load() if entry["type"] == "nameless"] if checkpoint.load() else []
+
+    def accept_record(record):
+        if record["id"] not in current_member_ids:
+            return False
+        if member_hashes.get(record["id"], {}).get("fields_hash") == fields_hash(record) and record["id"] not in affected_member_ids:
+            return False
+        if not record["fields"].get("Name"):
+            print(f"Skipping member with ID {record['id']} as their name is missing.")
+            nameless_records.append(record)
+            spool.append({"type": "nameless", "record": record})
+            return False
+        return True
+
+    def embed_changed_members(processed_members):
+        embed_members(reuse_embeddings(processed_members, existing_members_by_id))
+
+    project_index = build_project_index(projects)
+    pipeline = IngestPipeline(
+        build_member=lambda record, project_videos: build_member_data(record, project_index, project_videos),
+        find_video_url=lambda record: find_video_url(record, project_index),
+        embed_members=embed_changed_members,
+        media_store=MediaStore(),
+        accept_record=accept_record,
+        client=client,
+    )
+    processed_members, members_to_process = await pipeline.run(members_table_url(), members_table_headers(), queries, checkpoint, spool)
+    # A resumed run can process records of a partly finished page twice; keep the latest.
+    processed_members = list({member["id"]: member for member in processed_members}.values())
+
+    # Members whose name was removed are skipped; drop their old record too.
+    deleted_ids |= set(record["id"] for record in nameless_records if record["id"] in existing_members_by_id)
+    save_members(existing_members, processed_members, deleted_ids)
+
+    # Failed records keep their old hash so the next sync retries them.
+    members_to_process = [record for record in members_to_process + nameless_records if record["id"] not in pipeline.failed_ids]
+    synced_at = airtable_timestamp(sync_started_at)
+    for record in members_to_process:
+        sync_state["members"][record["id"]] = {"fields_hash": fields_hash(record), "synced_at": synced_at}
+    for member_id in set(sync_state["members"]) - current_member_ids:
+        del sync_state["members"][member_id]
+    sync_state["projects"] = {project["id"]: fields_hash(project) for project in projects}
+    sync_state["members_synced_at"] = airtable_timestamp(sync_started_at - SYNC_WATERMARK_SKEW)
+    sync_state["retry_member_ids"] = sorted(pipeline.failed_ids)
+    member_store.save_sync_state(sync_state)
+    checkpoint.clear()
+    spool.clear()
+    return {
+        "members": {"current": len(current_member_ids), "processed": len(processed_members),
+                    "deleted": len(deleted_ids), "failed": len(pipeline.failed_ids)},
+        "projects": {"current": len(projects), "changed": len(changed_projects), "deleted": len(deleted_project_ids)},
+        "stages": pipeline.progress.counts,
+        "stage_failures": pipeline.progress.failures,
+    }
+
+def build_member_data(member, project_index, project_videos):
     member_name = member["fields"]["Name"]
-    projects = get_projects()
 
     text_representation = f"Name: {member_name}, Areas of Expertise: {member['fields'].get('What are your areas of expertise and interest?', '')}, Entry Type: {member['fields'].get('Team or individual entry type', '')}, Looking for Team Members: {member['fields'].get('Looking for more team members?', '')}, Dietary Requirements: {member['fields'].get('Dietary requirements', '')}, City: {member['fields'].get('Which City are you participating from?', '')}"
 
-    member_project = next((project for project in projects if "Team member emails (separate by comma)" in project["fields"] and member["fields"]["Email"] in project["fields"]["Team member emails (separate by comma)"]), None)
-    video_base64 = ""
+    member_project = find_member_project(member, project_index)
+    video = {}
     project_text_representation = ""
     project_fields = {}  # Initialize project_fields
 
@@ -131,16 +326,7 @@ def process_member(member, current_index, total_members):
             f"Github: {project_fields.get('Link to github or platform sharable link e.g., Relevance AI URL, Github repo', 'N/A')}, "
         )
 
-        # Download and encode video as base64
-        video_url = project_fields.get('Link to recorded demo (City Finals)', '')
-        if is_valid_url(video_url):
-            video_response = requests.get(video_url)
-            if video_response.ok:
-                video_base64 = base64.b64encode(video_response.content).decode('utf-8')
-            else:
-                print(f"Failed to download video for project ID {member_project['id']}")
-        else:
-            print(f"Invalid video URL: {video_url}")
+        video = video_details(project_videos.get(project_fields.get('Link to recorded demo (City Finals)', '')))
 
     member_data = {
         "id": member["id"],
@@ -156,6 +342,7 @@ def process_member(member, current_index, total_members):
         "dietary_requirements": member["fields"].get("Dietary requirements", ""),
         "member_text_representation": text_representation,
         "project_text_representation": project_text_representation,
+        "project_id": member_project["id"] if member_project else None,
         "project_details": {
             "Name": project_fields.get('Team name', 'N/A'),
             "Team members": project_fields.get('Team members', 'N/A'),
@@ -165,37 +352,15 @@ def process_member(member, current_index, total_members):
             "Github": project_fields.get('Link to github or platform sharable link e.g., Relevance AI URL, Github repo', 'N/A')
         },
         "city": member["fields"].get("Which City are you participating from?", ""),
-        "combined_embedding": create_embedding(f"{text_representation} {project_text_representation}"),
-        "video_base64": video_base64
+        "combined_embedding": None,  # Filled in batches by embed_members
+        "video": video
     }
 
     return member_data
 
 if __name__ == "__main__":
-    members = get_records("Members")
-    total_members = len(members)
-    print(f"Total members to process: {total_members}")
-
-    existing_members_ids = set()
-
-    try:
-        with open("members.py", "r") as file:
-            data = file.read()
-            members_dict = {}
-            exec(data, members_dict)
-            existing_members = members_dict.get("members", [])
-            existing_members_ids = set(member["id"] for member in existing_members if isinstance(member, dict))
-    except FileNotFoundError:
-        existing_members_ids = set()
-
-    new_members_to_process = find_new_members(members, existing_members_ids)
-
-    with ThreadPoolExecutor() as executor:
-        results = []
-        for index, member in enumerate(new_members_to_process, start=1):
-            result = executor.submit(process_member, member, index, len(new_members_to_process))
-            results.append(result)
-
-        processed_members = [result.result() for result in results]
-
-    save_members(processed_members)
\ No newline at end of file
+    # SYNC_PROFILE=cprofile or SYNC_PROFILE=sample profiles the whole sync into data/profiles/.
+    profile_mode = os.environ.get("SYNC_PROFILE")
+    profile_path = os.path.join(PROFILES_DIR, f"sync_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.{'prof' if profile_mode == 'cprofile' else 'folded'}")
+    with metrics.profiled(profile_mode, profile_path):
+        sync_members()
@@ -0,0 +1,426 @@
+import asyncio
+import contextlib
+import json
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+import numpy as np
+
+from airtable_reader import aiter_pages
+from avatars import IMAGES_DIR, create_thumbnails
+import metrics
+
+# Status codes worth retrying; everything else is returned to the caller.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# (max concurrent requests, requests per second) per host. Airtable allows 5 requests/s per base.
+DEFAULT_HOST_LIMITS = {"api.airtable.com": (4, 4.5)}
+DEFAULT_HOST_LIMIT = (8, 20.0)
+PROGRESS_INTERVAL = 5.0
+
+STOP = object()
+
+def stop_nowait(queue):
+    # For a stage that failed or was cancelled: the next stage may be cancelled too, so a blocking
+    # put on its full queue would never return. run() cancels every stage in that case anyway.
+    with contextlib.suppress(asyncio.QueueFull):
+        queue.put_nowait(STOP)
+
+class RateLimiter:
+    """
+    Spaces calls evenly so no more than `rate` start per second.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_time = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class HostLimitedClient:
+    """
+    Pooled async HTTP client with a concurrency cap and rate limit per host, and retry with
+    jittered exponential backoff on 429s, 5xx responses and connection errors.
+    """
+
+    def __init__(self, host_limits=None, max_retries=5, timeout=30.0):
+        self.host_limits = {**DEFAULT_HOST_LIMITS, **(host_limits or {})}
+        self.max_retries = max_retries
+        self.hosts = {}
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        )
+
+    def host_guards(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.hosts:
+            concurrency, rate = self.host_limits.get(host, DEFAULT_HOST_LIMIT)
+            self.hosts[host] = (asyncio.Semaphore(concurrency), RateLimiter(rate))
+        return self.hosts[host]
+
+    async def request(self, method, url, **kwargs):
+        semaphore, rate_limiter = self.host_guards(url)
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            async with semaphore:
+                await rate_limiter.wait()
+                try:
+                    with metrics.span("http.request"):
+                        response = await self.client.request(method, url, **kwargs)
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        raise
+                    response = None
+            metrics.count("http.requests")
+            if response is not None:
+                metrics.count("http.bytes_received", len(response.content))
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                metrics.count(f"http.status_{response.status_code}")
+                retry_after = response.headers.get("Retry-After")
+            metrics.count("http.retries")
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        # Streams hold their host slot until the body has been consumed.
+        semaphore, rate_limiter = self.host_guards(url)
+        async with semaphore:
+            await rate_limiter.wait()
+            metrics.count("http.requests")
+            async with self.client.stream(method, url, **kwargs) as response:
+                yield response
+
+    async def aclose(self):
+        await self.client.aclose()
+
+def backoff_delay(attempt, retry_after=None, base_delay=0.5, max_delay=30.0):
+    if retry_after:
+        try:
+            return min(float(retry_after), max_delay)
+        except ValueError:
+            pass
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+class Progress:
+    def __init__(self, stages):
+        self.counts = {stage: 0 for stage in stages}
+        self.failures = {stage: 0 for stage in stages}
+        self.started_at = time.monotonic()
+
+    def advance(self, stage, count=1):
+        self.counts[stage] += count
+
+    def fail(self, stage):
+        self.failures[stage] += 1
+
+    def report(self):
+        elapsed = time.monotonic() - self.started_at
+        stages = ", ".join(f"{stage} {count}" + (f" ({self.failures[stage]} failed)" if self.failures[stage] else "") for stage, count in self.counts.items())
+        print(f"[{elapsed:6.1f}s] {stages}")
+
+class Spool:
+    """
+    Append-only JSON-lines log of pipeline results, so a resumed sync keeps the work finished
+    before it was interrupted. Entries are dicts with a "type" key.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # Torn final line from the interruption
+        return entries
+
+    def append(self, entry):
+        if self.file is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path, "a")
+        self.file.write(json.dumps(entry, default=lambda value: value.tolist() if isinstance(value, np.ndarray) else str(value)) + "\n")
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def clear(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class IngestPipeline:
+    """
+    Staged async ingest: paginated Airtable fetch -> image download -> demo video fetch ->
+    batched embedding -> collect. Stages are connected by bounded queues, so a slow stage applies
+    backpressure to the ones before it instead of buffering the whole table in memory.
+
+    build_member(record, project_videos) turns a record into a member dict (or "" to skip it),
+    find_video_url(record) returns the record's demo video URL, and embed_members(members)
+    fills in embeddings in place (it runs in a worker thread).
+
+    With a checkpoint (airtable_reader.Checkpoint) and a spool, finished records are logged to the
+    spool and the listing cursor is saved once every record of a page is finished, so an
+    interrupted run resumes from the first unfinished page.
+    """
+
+    stages = ("fetched", "images", "media", "embedded", "written")
+
+    def __init__(self, build_member, find_video_url, embed_members, media_store, accept_record=None, client=None,
+                 image_workers=8, media_workers=4, embedding_batch_size=512, embedding_linger=1.0, queue_size=256):
+        self.build_member = build_member
+        self.find_video_url = find_video_url
+        self.embed_members = embed_members
+        self.media_store = media_store
+        self.accept_record = accept_record or (lambda record: True)
+        # A client passed in belongs to the caller, which closes it.
+        self.owns_client = client is None
+        self.client = client or HostLimitedClient()
+        self.image_workers = image_workers
+        self.media_workers = media_workers
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_linger = embedding_linger
+        self.queue_size = queue_size
+        self.failed_ids = set()
+        self.checkpoint = None
+        self.spool = None
+        self.in_flight = {}
+        self.pages = []
+        self.committed_pages = 0
+        self.video_tasks = {}
+        self.project_videos = {}
+        self.progress = Progress(self.stages)
+
+    async def run(self, url, headers, queries, checkpoint=None, spool=None):
+        """
+        Pages through url once per params dict in queries and returns (processed members, accepted records).
+        """
+        records_queue = asyncio.Queue(self.queue_size)
+        images_queue = asyncio.Queue(self.queue_size)
+        members_queue = asyncio.Queue(self.queue_size)
+        embedded_queue = asyncio.Queue(self.queue_size)
+        accepted_records = []
+        processed_members = []
+
+        self.checkpoint, self.spool = checkpoint, spool
+        cursor = checkpoint.load() if checkpoint and spool else None
+        if cursor:
+            print(f"Resuming from checkpoint at query {cursor[0]}, offset {cursor[1]}")
+            self.resume(spool.load(), processed_members, accepted_records)
+        elif spool:
+            spool.clear()
+
+        reporter = asyncio.create_task(self.report_progress())
+        tasks = [asyncio.create_task(stage) for stage in (
+            self.fetch_stage(url, headers, queries, cursor, records_queue, accepted_records),
+            self.run_stage("images", self.download_image, records_queue, images_queue, self.image_workers),
+            self.run_stage("media", self.process_record, images_queue, members_queue, self.media_workers),
+            self.embed_stage(members_queue, embedded_queue),
+            self.write_stage(embedded_queue, processed_members),
+        )]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the other stages before the client closes under them; the checkpoint keeps finished pages.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            reporter.cancel()
+            if self.owns_client:
+                await self.client.aclose()
+        self.progress.report()
+        return processed_members, accepted_records
+
+    async def report_progress(self):
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            self.progress.report()
+
+    def resume(self, entries, processed_members, accepted_records):
+        for entry in entries:
+            if entry["type"] == "member":
+                processed_members.append(entry["member"])
+            elif entry["type"] == "accepted":
+                accepted_records.append(entry["record"])
+            elif entry["type"] == "failed":
+                self.failed_ids.add(entry["id"])
+        print(f"Recovered {len(processed_members)} processed members from the spool")
+
+    async def fetch_stage(self, url, headers, queries, cursor, out_queue, accepted_records):
+        try:
+            async for records, next_cursor in aiter_pages(self.client, url, headers, queries, cursor):
+                page = {"pending": 0, "fetched": False, "cursor": next_cursor}
+                page_number = len(self.pages)
+                self.pages.append(page)
+                for record in records:
+                    self.progress.advance("fetched")
+                    if self.accept_record(record):
+                        accepted_records.append(record)
+                        page["pending"] += 1
+                        self.in_flight[record["id"]] = (page_number, record)
+                        await out_queue.put(record)
+                page["fetched"] = True
+                self.commit_pages()
+        except BaseException:
+            stop_nowait(out_queue)
+            raise
+        await out_queue.put(STOP)
+
+    def finish_record(self, record_id, failed=False):
+        page_number, record = self.in_flight.pop(record_id, (None, None))
+        if page_number is None:
+            return
+        if not failed:
+            self.failed_ids.discard(record_id)  # Failed in an earlier, interrupted run
+        if self.spool:
+            self.spool.append({"type": "failed", "id": record_id} if failed else {"type": "accepted", "record": record})
+        self.pages[page_number]["pending"] -= 1
+        self.commit_pages()
+
+    def commit_pages(self):
+        # Advance the checkpoint over the leading run of pages whose records are all finished.
+        cursor = None
+        while self.committed_pages < len(self.pages):
+            page = self.pages[self.committed_pages]
+            if not page["fetched"] or page["pending"]:
+                break
+            cursor = page["cursor"]
+            self.committed_pages += 1
+        if cursor and self.checkpoint:
+            self.spool.flush()
+            self.checkpoint.save(cursor)
+
+    async def run_stage(self, stage, handle, in_queue, out_queue, workers):
+        async def worker():
+            while True:
+                item = await in_queue.get()
+                if item is STOP:
+                    await in_queue.put(STOP)  # Let sibling workers see it too
+                    return
+                try:
+                    result = await handle(item)
+                except Exception as error:
+                    print(f"{stage} failed for {item.get('id')}: {error}")
+                    self.failed_ids.add(item.get("id"))
+                    self.progress.fail(stage)
+                    self.finish_record(item.get("id"), failed=True)
+                    continue
+                self.progress.advance(stage)
+                if result:
+                    await out_queue.put(result)
+                else:
+                    self.finish_record(item.get("id"))
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        except BaseException:
+            stop_nowait(out_queue)
+            raise
+        await out_queue.put(STOP)
+
+    @metrics.timed("ingest.download_image")
+    async def download_image(self, record):
+        image_url = (record["fields"].get("Profile picture") or [{}])[0].get("url")
+        if not image_url:
+            return record
+
+        response = await self.client.request("GET", image_url)
+        if not response.is_success:
+            print(f"Failed to download image for member ID {record['id']}")
+            return record
+
+        metrics.count("ingest.image_bytes", len(response.content))
+        image_path = os.path.join(IMAGES_DIR, f"{record['id']}.png")
+        with open(f"{image_path}.tmp", "wb") as image_file:
+            image_file.write(response.content)
+        os.replace(f"{image_path}.tmp", image_path)
+        try:
+            with metrics.span("ingest.create_thumbnails"):
+                await asyncio.to_thread(create_thumbnails, image_path)
+        except OSError as error:
+            print(f"Failed to create thumbnails for member ID {record['id']}: {error}")
+        return record
+
+    async def fetch_video(self, video_url):
+        # Teammates share a project video; the first one starts the download, the rest await it.
+        if video_url not in self.video_tasks:
+            self.video_tasks[video_url] = asyncio.create_task(self.media_store.fetch_async(video_url, self.client))
+        self.project_videos[video_url] = await self.video_tasks[video_url]
+
+    @metrics.timed("ingest.process_record")
+    async def process_record(self, record):
+        video_url = self.find_video_url(record)
+        if video_url:
+            await self.fetch_video(video_url)
+        return self.build_member(record, self.project_videos)
+
+    async def next_batch(self, in_queue):
+        """
+        Waits for the first member, then collects more for up to embedding_linger seconds
+        or until the batch is full. Returns (batch, finished).
+        """
+        batch = []
+        item = await in_queue.get()
+        deadline = time.monotonic() + self.embedding_linger
+        while item is not STOP:
+            batch.append(item)
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.embedding_batch_size or remaining <= 0:
+                return batch, False
+            try:
+                item = await asyncio.wait_for(in_queue.get(), remaining)
+            except asyncio.TimeoutError:
+                return batch, False
+        return batch, True
+
+    async def embed_stage(self, in_queue, out_queue):
+        try:
+            finished = False
+            while not finished:
+                batch, finished = await self.next_batch(in_queue)
+                if batch:
+                    with metrics.span("ingest.embed_batch"):
+                        await asyncio.to_thread(self.embed_members, batch)
+                    self.progress.advance("embedded", len(batch))
+                    for member in batch:
+                        await out_queue.put(member)
+        except BaseException:
+            stop_nowait(out_queue)
+            raise
+        await out_queue.put(STOP)
+
+    async def write_stage(self, in_queue, processed_members):
+        while True:
+            member = await in_queue.get()
+            if member is STOP:
+                return
+            processed_members.append(member)
+            if self.spool:
+                self.spool.append({"type": "member", "member": member})
+            self.finish_record(member["id"])
+            self.progress.advance("written")
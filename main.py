@@ -1,13 +1,14 @@
 import streamlit as st
-from members import members
-from get_members import create_embedding
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
-import base64
-import os
+from concurrent.futures import ThreadPoolExecutor
+from dataset import DatasetLoader
+from text_index import is_keyword_query, reciprocal_rank_fusion
+from result_cache import ResultCache, normalize_query
+import metrics
 from streamlit_pills import pills
+import cProfile
+import os
 import random
-import re
+import time
 
 hide_streamlit_style = """
             <style>
@@ -17,15 +18,73 @@ hide_streamlit_style = """
             """
 st.markdown(hide_streamlit_style, unsafe_allow_html=True) 
 
-def get_image_base64(path):
-    if os.path.exists(path):
-        with open(path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode()
-        return f"data:image/png;base64,{encoded_string}"
-    else:
-        with open("member_images/default.png", "rb") as default_image_file:
-            encoded_string = base64.b64encode(default_image_file.read()).decode()
-        return f"data:image/png;base64,{encoded_string}"
+# Seconds to wait for the query embedding before answering from the keyword index alone.
+EMBEDDING_TIMEOUT = 5
+# Candidates taken from each ranker before fusion.
+FUSION_CANDIDATES = 100
+# "float16" or "int8" keeps the search matrix quantized; the best RERANK_CANDIDATES are re-scored in float32.
+EMBEDDING_PRECISION = os.environ.get("EMBEDDING_PRECISION", "float32")
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", 200))
+# Large rosters are searched through an ANN index (see ann_index.py) probing ANN_N_PROBE lists;
+# more lists trade latency for recall. ANN_ENABLED=0 searches exactly instead.
+ANN_N_PROBE = int(os.environ.get("ANN_N_PROBE", 8))
+ANN_ENABLED = os.environ.get("ANN_ENABLED", "1") != "0"
+MEMBERS_PER_PAGE = 20
+# Rankings that fell back to keyword search because embedding failed are only cached briefly.
+DEGRADED_RESULT_TTL = 30
+# Built in the background once the first page is out, rather than before it.
+SEARCH_RESOURCES = ("text_index", "member_index")
+
+@st.cache_resource
+def get_dataset_loader():
+    return DatasetLoader(precision=EMBEDDING_PRECISION, rerank=RERANK_CANDIDATES, n_probe=ANN_N_PROBE, ann=ANN_ENABLED)
+
+# Streamlit re-executes this script on every rerun, so each run sees a single version of the data.
+dataset = get_dataset_loader().current()
+
+def get_dataset():
+    return dataset
+
+def get_member_lookup():
+    return get_dataset().lookup
+
+def get_card_renderer():
+    return get_dataset().card_renderer
+
+def get_member_index():
+    return get_dataset().member_index
+
+def get_text_index():
+    return get_dataset().text_index
+
+@st.cache_resource
+def get_result_cache():
+    return ResultCache()
+
+@st.cache_resource
+def get_embedding_executor():
+    return ThreadPoolExecutor(max_workers=4)
+
+def embed_query(query):
+    # get_members brings in the OpenAI client and the sync code, so it is imported on first use.
+    from get_members import create_embedding
+    return create_embedding(query)
+
+def load_embedding_service():
+    from get_members import get_embedding_service
+    return get_embedding_service()
+
+@st.cache_resource
+def warm_up_embeddings():
+    return get_embedding_executor().submit(load_embedding_service)
+
+def warm_up_search():
+    """
+    Loads the search indexes and the embedding client in the background after the first page has
+    rendered. Both are loaded on demand as well, so a search before this finishes just waits.
+    """
+    get_dataset().warm(SEARCH_RESOURCES)
+    warm_up_embeddings()
 
 st.markdown("""
     <style>
@@ -67,6 +126,26 @@ st.markdown("""
     .linkedin_link:hover {
         color: #188CFE !important;
     }
+    .member-card {
+        display: flex;
+        gap: 1rem;
+    }
+    .member-card .image-container {
+        flex: 0 0 25%;
+    }
+    .member-card .member-details {
+        flex: 1;
+    }
+    .project-grid {
+        display: grid;
+        grid-template-columns: 1fr 1fr;
+        gap: 1rem;
+    }
+    .demo-video {
+        width: 100%;
+        aspect-ratio: 16 / 9;
+        border: 0;
+    }
     .build-update {
       box-sizing: border-box;
       padding: 1rem;
@@ -90,218 +169,136 @@ def display_header():
         "<p style='text-align: center;'>Built with ❤️ and ☕️ by <a href='https://www.linkedin.com/in/becca9941/' target='_blank'>Becca</a> (beta version).</p>",
         unsafe_allow_html=True)
 
-def display_project(project_details):
-    if not isinstance(project_details, dict) or not project_details:
-        print("Skipping project: Invalid project details.")
-        return
-
-    project_name = project_details.get('Name', '')
-    team_members = project_details.get('Team members', '')
-    city = project_details.get('City', '')
-    overview = project_details.get('Overview', '')
-    demo_link = project_details.get('Demo', '')
-    github_link = project_details.get('Github', '')
-
-    st.write(f"**{project_name}**")
-    st.write(f"{overview}")
-
-    if team_members:
-        st.write(f"**Team Members:** {team_members}")
-
-    st.write(f"**City:** {city}")
-
-    # Display demo link if available
-    if demo_link and demo_link.startswith('https:'):
-        try:
-          st.video(demo_link)
-        except:
-            st.write(demo_link)
-    else:
-        st.write(f"**Demo Link:** Not available")
+def render_html(name, build, items):
+    """
+    Builds a block of HTML and sends it as one element, recording build/send time and payload size
+    under st.session_state.render_stats[name].
+    """
+    start = time.perf_counter()
+    html = build()
+    built = time.perf_counter()
+    st.markdown(html, unsafe_allow_html=True)
+    metrics.metrics.record(f"render.{name}.build", built - start)
+    metrics.metrics.record(f"render.{name}.send", time.perf_counter() - built)
+    metrics.count("render.bytes_sent", len(html.encode("utf-8")))
+    st.session_state.setdefault("render_stats", {})[name] = {
+        "items": items,
+        "payload_bytes": len(html.encode("utf-8")),
+        "build_ms": (built - start) * 1000,
+        "render_ms": (time.perf_counter() - built) * 1000,
+    }
 
-    st.write(f"**GitHub:** {github_link}")
-    st.write("---")  # Add a horizontal line separator
+def display_members(members):
+    render_html("members", lambda: get_card_renderer().members_html(members), len(members))
 
 def display_projects(members):
-    all_projects = []
-
-    for member in members:
-        if isinstance(member, dict) and 'project_details' in member:
-            project_details = member['project_details']
-            if isinstance(project_details, dict):
-                demo_link = project_details.get('Demo', '').strip()
-                if demo_link and demo_link.startswith('https:'):
-                    all_projects.append(project_details)
-            else:
-                print(f"Skipping member: project_details is not a dictionary: {project_details}")
-        else:
-            print("Skipping member: No project details found.")
-
-    num_projects = len(all_projects)
-    num_cols = 2  # Display 2 projects side by side
-
-    for i in range(0, num_projects, num_cols):
-        cols = st.columns(num_cols)
-        for j, col in enumerate(cols):
-            project_index = i + j
-            if project_index < num_projects:
-                with col:
-                    display_project(all_projects[project_index])
-
-def is_valid_url(url):
-    # Regular expression to validate a URL
-    regex = re.compile(
-        r'^(?:http|ftp)s?://' # http:// or https://
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|' # domain...
-        r'localhost|' # localhost...
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}|' # ...or ipv4
-        r'\[?[A-F0-9]*:[A-F0-9:]+\]?)' # ...or ipv6
-        r'(?::\d+)?' # optional port
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-    return re.match(regex, url) is not None
-
-def display_member(member):
-    if not isinstance(member, dict) or 'profile_picture' not in member:
-        print("Skipping member: No profile picture found.")
-        return
-    profile_image = get_image_base64(member['profile_picture'])
-
-    name = member["name"]
-    skills = member["areas_of_expertise"]
-    bio = member.get('bio', '').encode('utf-8', 'ignore').decode('utf-8')
-    entry_type = member.get('entry_type', '').encode('utf-8', 'ignore').decode('utf-8')
-    industries = ', '.join(member.get('areas_of_expertise', [])).encode('utf-8', 'ignore').decode('utf-8')
-    weird_fact = member.get('dietary_requirements', '').encode('utf-8', 'ignore').decode('utf-8')
-    looking_for_team_members = member.get('looking_for_team_members', '').encode('utf-8', 'ignore').decode('utf-8')
-    team_members = []
-    if member.get('project_details'):
-        team_members_data = member['project_details'].get('Team members', [])
-        team_member_names = [get_member_name(team_member_id, members) for team_member_id in team_members_data]
-        team_members = [name.encode('utf-8', 'ignore').decode('utf-8') for name in team_member_names if name]
-    city = member.get('city', '').encode('utf-8', 'ignore').decode('utf-8')
-
-    linkedin_url = member.get('linkedin_url', '')
-    twitter_url = member.get('twitter_url', '')
-
-    # Validate URLs
-    valid_linkedin = is_valid_url(linkedin_url)
-    valid_twitter = is_valid_url(twitter_url)
-
-    # Use Twitter URL if LinkedIn URL is not provided or invalid
-    url = linkedin_url if valid_linkedin else (twitter_url if valid_twitter else '')
-
-    col1, col2 = st.columns([1, 3])
-    with col1:
-        if profile_image:
-            st.markdown(f"<div class='image-container'><img src='{profile_image}'></div>", unsafe_allow_html=True)
-    with col2:
-        if url:  # Only create the link if either LinkedIn or Twitter URL is present and valid
-            st.markdown(f"<span>**<a class='linkedin_link' href='{url}'>{name}</a>**</span><br>", unsafe_allow_html=True)
-        else:
-            st.markdown(f"<span>**{name}**</span><br>", unsafe_allow_html=True)
-
-        skills_html = ''.join([f"<span class='skill-chip'>{skill}</span>" for skill in skills])
-        st.markdown(skills_html, unsafe_allow_html=True)
-        st.write(f"**Bio:** {bio}")
-        if team_members:
-          st.write(f"**Team Members:** {', '.join(team_members)}")
-        st.write(f"**Looking for Team Members:** {looking_for_team_members}")
-        if city:
-          st.write(f"**City:** {city}")
-    st.markdown("---")
-
-def get_member_name(member_id, members):
-    for member in members:
-        if member['id'] == member_id:
-            return member['name']
-    return None
-
-    st.markdown("---")
-
-def cosine_similarity(vec1, vec2):
-    return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
-
-def retrieve_and_rank(query_embedding, items, embedding_key):
-    valid_items = [item for item in items if isinstance(item, dict) and embedding_key in item]
-    similarities = [(item, cosine_similarity(query_embedding, item[embedding_key])) for item in valid_items]
-    sorted_items = sorted(similarities, key=lambda x: x[1], reverse=True)
-    return [item[0] for item in sorted_items]
-
-def retrieve_and_rank_build_updates(query_embedding, members, embedding_key):
-    valid_build_updates = []
-    for member in members:
-        if "projects" in member:
-            for project in member["projects"]:
-                if "build_updates" in project["details"]:
-                    for build_update in project["details"]["build_updates"]:
-                        if embedding_key in build_update:
-                            valid_build_updates.append({
-                                "member_name": member["name"],
-                                "member_picture": get_image_base64(member["profile_picture"]),
-                                "build_update": build_update,
-                                "project_name": project['project_name'],
-                                "similarity": cosine_similarity(query_embedding, build_update[embedding_key])
-                            })
-
-    sorted_build_updates = sorted(valid_build_updates, key=lambda x: x["similarity"], reverse=True)
-    return sorted_build_updates
-
-
+    render_html("projects", lambda: get_card_renderer().projects_html(members), len(members))
+
+@metrics.timed("search.retrieve_and_rank")
+def retrieve_and_rank(query_embedding, member_index, k=20, skill=None, city=None):
+    return [member for member, similarity in member_index.search(query_embedding, k, skill, city)]
+
+@metrics.timed("search.hybrid_search")
+def hybrid_search(query, k=20):
+    """
+    Fuses BM25 and embedding rankings with reciprocal rank fusion. Keyword queries, and any query
+    while the embedding API is slow or failing, are answered from the local BM25 index alone.
+    Returns (members, query embedding or None).
+    """
+    lexical_members = [member for member, score in get_text_index().search(query, FUSION_CANDIDATES)]
+    if is_keyword_query(query) and lexical_members:
+        return lexical_members[:k], None
+
+    try:
+        with metrics.span("search.embed_query"):
+            query_embedding = get_embedding_executor().submit(embed_query, query).result(timeout=EMBEDDING_TIMEOUT)
+    except Exception as error:
+        metrics.count("search.embedding_fallbacks")
+        print(f"Query embedding failed, using keyword search only: {error!r}")
+        return lexical_members[:k], None
+
+    semantic_members = retrieve_and_rank(query_embedding, get_member_index(), FUSION_CANDIDATES)
+    return reciprocal_rank_fusion([semantic_members, lexical_members])[:k], query_embedding
+
+
+
+def search_results(query):
+    """
+    Returns (ranked member ids, query embedding or None) for the query, from the result cache
+    when this query was ranked recently against the same data.
+    """
+    key = ("search", get_dataset().version, normalize_query(query))
+    cached = get_result_cache().get(key)
+    if cached is None:
+        members, query_embedding = hybrid_search(query, FUSION_CANDIDATES)
+        cached = (tuple(member["id"] for member in members), query_embedding)
+        degraded = query_embedding is None and not (is_keyword_query(query) and members)
+        get_result_cache().put(key, cached, ttl=DEGRADED_RESULT_TTL if degraded else None)
+    return cached
+
+def browse_results(skill):
+    key = ("browse", get_dataset().version, skill)
+    lookup = get_member_lookup()
+    return get_result_cache().get_or_compute(key, lambda: tuple(lookup.members[row]["id"] for row in lookup.filter_rows(skills=[skill])))
 
 def rag_query():
     query = st.text_area("", placeholder="🔍 Search for hackathon members:'Who works in education?', 'GTM strategies?'")
-    submit = st.button("Search")
-
-    if submit:
-        query_embedding = create_embedding(query)
-
-        top_members = retrieve_and_rank(query_embedding, members, 'combined_embedding')
-        top_build_updates = retrieve_and_rank_build_updates(query_embedding, members, 'build_update_embeddings')
-
-        tab1, tab2 = st.tabs(["👩‍💻 BUILDERS", "🚀 PROJECTS"])
-
-        with tab1:
-            st.subheader("Top members who match your search")
-            for member in top_members[:20]:
-                display_member(member)
-        with tab2:
-            st.subheader("Top projects that match your search")
-            for member in top_members[:20]:
-                display_projects(top_members[:20])
-
-        return True
+    if st.button("Search"):
+        st.session_state.search_query = query
+        st.session_state.page_search = 1
 
-    return False
+    # The submitted query sticks for this session, so paging through results doesn't clear them.
+    query = st.session_state.get("search_query", "")
+    if not query.strip():
+        return False
 
-def paginate_members(members):
-    if "page_number" not in st.session_state:
-        st.session_state.page_number = 1
+    member_ids, _ = search_results(query)
 
-    items_per_page = 20
-    total_pages = (len(members) - 1) // items_per_page + 1
+    tab1, tab2 = st.tabs(["👩‍💻 BUILDERS", "🚀 PROJECTS"])
 
+    with tab1:
+        st.subheader("Top members who match your search")
+        paginate_members(member_ids, "search")
+    with tab2:
+        st.subheader("Top projects that match your search")
+        display_projects(members_by_id(member_ids[:MEMBERS_PER_PAGE]))
+
+    return True
+
+def members_by_id(member_ids):
+    lookup = get_member_lookup()
+    return [member for member in map(lookup.member, member_ids) if member is not None]
+
+def paginate_members(member_ids, view):
+    """
+    Shows one page of a cached ranking. The page number is kept per view in this session's state
+    and set by the slider directly, so moving it only re-slices the ranking.
+    """
+    page_key = f"page_{view}"
+    total_pages = max(1, (len(member_ids) - 1) // MEMBERS_PER_PAGE + 1)
     # Ensure the page number is within the valid range
-    if st.session_state.page_number > total_pages:
-        st.session_state.page_number = total_pages
-
-    start_idx = (st.session_state.page_number - 1) * items_per_page
-    end_idx = start_idx + items_per_page
-    displayed_members = members[start_idx:end_idx]
+    if not 1 <= st.session_state.get(page_key, 1) <= total_pages:
+        st.session_state[page_key] = 1
+    page_number = st.session_state.get(page_key, 1)
 
-    for member in displayed_members:
-        display_member(member)
+    start_idx = (page_number - 1) * MEMBERS_PER_PAGE
+    display_members(members_by_id(member_ids[start_idx:start_idx + MEMBERS_PER_PAGE]))
 
-    # Use a min and max value to constrain the slider within valid limits
-    page_number = None  # Initialize page_number as None
     if total_pages > 1:
-        page_number = st.slider("Pages (20 members per page):", min_value=1, max_value=total_pages, value=st.session_state.page_number)
+        st.slider(f"Pages ({MEMBERS_PER_PAGE} members per page):", min_value=1, max_value=total_pages, key=page_key)
     else:
         # If there is only one page, don't show the slider
         st.write(f"Page 1 of {total_pages}")
 
-    if page_number is not None and st.session_state.page_number != page_number:
-        st.session_state.page_number = page_number
-        st.experimental_rerun()
+def project_order():
+    """
+    This session's shuffled order of member rows for the project grid, kept until the data reloads.
+    """
+    dataset = get_dataset()
+    if st.session_state.get("project_order_version") != dataset.version:
+        st.session_state.project_order_seed = random.getrandbits(64)
+        st.session_state.project_order_version = dataset.version
+    return dataset.permutation(st.session_state.project_order_seed)
 
 def choose_data_type():
     st.write("")
@@ -320,12 +317,7 @@ def choose_data_type():
                        ["All", "AI Engineer", "Backend Engineer", "Frontend Engineer", "GTM", "Generalist", "Product manager", "Designer", "Domain expert", "IOS/App", "RAG", "DevTools", "Opensource", "Image/Multi-madel", "Ai Agents"],
                        ["🌐", "🤖", "🖥️", "💻", "📈", "🛠️", "📋", "🎨", "📚", "📱", "🔎", "🛠️", "🌍", "🖼️", "👾"], key="selected_skills")
 
-        filtered_members = members
-        if selected_skill != "All":
-            filtered_members = [member for member in members if isinstance(member, dict) and any(
-                skill in member.get("areas_of_expertise", []) for skill in [selected_skill])]
-
-        paginate_members(filtered_members)
+        paginate_members(browse_results(selected_skill), "browse")
 
 
 
@@ -338,16 +330,57 @@ def choose_data_type():
         with right_column:
             st.markdown('<a style="float: right; background-color: #1765FF; color: white; padding: 8px 12px; text-align: center; text-decoration: none; display: inline-block; border-radius: 5px;" href="https://join.slack.com/t/buildtogether-x1i6405/shared_invite/zt-2k0ev4aj8-KezF5NrYieTUBBmJY_DX_A">🚀 Go to the Slack!</a>',unsafe_allow_html=True)
 
-        random.shuffle(members)
         st.write("")
-        display_projects(members)
-
+        display_projects(get_member_lookup().members_at(project_order()))
+
+
+def diagnostics_enabled():
+    """
+    The diagnostics panel is hidden unless the page is opened with ?diagnostics=1.
+    """
+    # Newer Streamlit releases replace experimental_get_query_params with st.query_params.
+    if hasattr(st, "query_params"):
+        return st.query_params.get("diagnostics") == "1"
+    return st.experimental_get_query_params().get("diagnostics") == ["1"]
+
+def display_diagnostics(profiler):
+    from get_members import embedding_cache_stats
+
+    with st.expander("Diagnostics", expanded=True):
+        dataset = get_dataset()
+        st.write(f"Data version {dataset.version}, {len(dataset)} members, embedding precision {EMBEDDING_PRECISION}")
+        st.radio("Profile reruns of this session", ["off", "cprofile", "sample"], key="profile_mode", horizontal=True)
+        if isinstance(profiler, metrics.Sampler):
+            st.code("".join(profiler.collapsed().splitlines(keepends=True)[:30]) or "No samples.")
+        elif profiler is not None:
+            st.code(metrics.top_functions(profiler))
+        st.json({
+            "render": st.session_state.get("render_stats", {}),
+            "result_cache": get_result_cache().stats(),
+            "embedding_cache": embedding_cache_stats(),
+            "metrics": metrics.metrics.snapshot(),
+        })
 
 def main():
-    display_header()
-
-    if not rag_query():
-        choose_data_type()
+    diagnostics = diagnostics_enabled()
+    profile_mode = st.session_state.get("profile_mode") if diagnostics else None
+    profiler = {"cprofile": cProfile.Profile, "sample": metrics.Sampler}.get(profile_mode, lambda: None)()
+    if profiler is not None:
+        profiler.enable()
+
+    # Reruns and stops interrupt the script with an exception; a Sampler left enabled would keep sampling.
+    try:
+        with metrics.span("render.page"):
+            display_header()
+
+            if not rag_query():
+                choose_data_type()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+    warm_up_search()
+    if diagnostics:
+        display_diagnostics(profiler)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,147 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+
+import httpx
+
+import metrics
+
+MEDIA_DIR = "media"
+MANIFEST_FILE = "manifest.json"
+CHUNK_SIZE = 1024 * 1024
+
+class MediaStore:
+    """
+    Demo videos on disk, one file per distinct content, described by a JSON manifest keyed by URL.
+
+    Videos are streamed to disk in chunks, files with identical content are stored once, and
+    re-fetches are conditional on the ETag/Last-Modified recorded for the URL.
+    """
+
+    def __init__(self, media_dir=MEDIA_DIR):
+        self.media_dir = media_dir
+        self.manifest_path = os.path.join(media_dir, MANIFEST_FILE)
+        self.lock = threading.Lock()
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as f:
+                self.manifest = json.load(f)
+
+    def get(self, url):
+        return self.manifest.get(url)
+
+    def path_for_hash(self, content_hash, extension):
+        return os.path.join(self.media_dir, f"{content_hash}{extension}")
+
+    def record(self, url, entry):
+        with self.lock:
+            self.manifest[url] = entry
+            tmp_path = f"{self.manifest_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.manifest, f, indent=4)
+            os.replace(tmp_path, self.manifest_path)
+        return entry
+
+    def store_file(self, tmp_path, content_hash, extension):
+        path = self.path_for_hash(content_hash, extension)
+        if os.path.exists(path):
+            os.remove(tmp_path)  # Same content already stored for another URL
+        else:
+            os.replace(tmp_path, path)
+        return path
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry and entry.get("path") and os.path.exists(entry["path"]):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def download_path(self, url):
+        os.makedirs(self.media_dir, exist_ok=True)
+        return os.path.join(self.media_dir, f"{hashlib.sha256(url.encode()).hexdigest()}.part")
+
+    def record_download(self, metadata, tmp_path, digest, size):
+        extension = os.path.splitext(metadata["url"].split("?")[0])[1] or ".mp4"
+        path = self.store_file(tmp_path, digest.hexdigest(), extension)
+        return self.record(metadata["url"], {**metadata, "path": path, "size": size, "content_hash": digest.hexdigest()})
+
+    def record_page(self, metadata):
+        # A page (YouTube, Loom, ...) rather than a video file: keep the link, skip the download.
+        return self.record(metadata["url"], {**metadata, "path": None, "size": 0, "content_hash": None})
+
+    @metrics.timed("media.fetch")
+    async def fetch_async(self, url, client):
+        """
+        Downloads the video at url unless the stored copy is still current, through client (an
+        ingest_pipeline.HostLimitedClient). Returns the manifest entry, or the previous one if the
+        download failed. Callers are expected to fetch each URL at most once at a time.
+        """
+        entry = self.get(url)
+        try:
+            async with client.stream("GET", url, headers=self.conditional_headers(entry)) as response:
+                if response.status_code == 304:
+                    metrics.count("media.not_modified")
+                    return entry
+                if not response.is_success:
+                    print(f"Failed to download video {url}: HTTP {response.status_code}")
+                    return entry
+
+                metadata = response_metadata(url, response.headers)
+                if not is_video(metadata["content_type"]):
+                    return self.record_page(metadata)
+
+                digest = hashlib.sha256()
+                size = 0
+                tmp_path = self.download_path(url)
+                with open(tmp_path, "wb") as f:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        metrics.count("media.bytes_received", len(chunk))
+                        digest.update(chunk)
+                        size += len(chunk)
+                        f.write(chunk)
+        except httpx.HTTPError as error:
+            print(f"Failed to download video {url}: {error}")
+            return entry
+
+        return self.record_download(metadata, tmp_path, digest, size)
+
+    def import_base64(self, url, video_base64):
+        """
+        Writes a legacy base64-encoded video to disk so it doesn't have to be downloaded again.
+        """
+        if url in self.manifest:
+            return self.manifest[url]
+        content = base64.b64decode(video_base64)
+        content_hash = hashlib.sha256(content).hexdigest()
+        os.makedirs(self.media_dir, exist_ok=True)
+        tmp_path = os.path.join(self.media_dir, f"{content_hash}.part")
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        extension = os.path.splitext(url.split("?")[0])[1] or ".mp4"
+        path = self.store_file(tmp_path, content_hash, extension)
+        return self.record(url, {"url": url, "content_type": None, "etag": None, "last_modified": None,
+                                 "path": path, "size": len(content), "content_hash": content_hash})
+
+def response_metadata(url, headers):
+    return {
+        "url": url,
+        "content_type": headers.get("Content-Type", "").split(";")[0],
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+    }
+
+def is_video(content_type):
+    return content_type.startswith("video/") or content_type == "application/octet-stream"
+
+def video_details(entry):
+    """
+    The part of a manifest entry that is stored on member records.
+    """
+    if not entry:
+        return {}
+    return {key: entry[key] for key in ("url", "path", "content_type", "size", "content_hash")}
@@ -0,0 +1,155 @@
+import numpy as np
+
+PRECISIONS = ("float32", "float16", "int8")
+# Quantized matrices are widened to float32 a cache-sized block at a time rather than copied whole.
+SCORE_BLOCK_ROWS = 4096
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def quantize(matrix, precision):
+    """
+    Converts a normalized float32 matrix to the given precision. Returns (matrix, per-row scales),
+    where scales is None except for int8, whose rows are each scaled so their largest value maps to 127.
+    """
+    if precision == "float32":
+        return matrix, None
+    if precision == "float16":
+        return matrix.astype(np.float16), None
+    if precision == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127 if len(matrix) else np.zeros(0, dtype=np.float32)
+        scales[scales == 0] = 1
+        return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    raise ValueError(f"Unknown embedding precision: {precision}")
+
+class MemberIndex:
+    """
+    Vector index over member embeddings, built once per process.
+
+    Embeddings are stored as a pre-normalized matrix so a query is scored with a single
+    matrix-vector product, and top-k selection uses argpartition instead of a full sort.
+    With an ann_index (see ann_index.IVFIndex) only the candidate rows it returns are scored.
+
+    precision="float16" or "int8" keeps the matrix quantized (2x / 4x smaller); with rerank > 0 the
+    best `rerank` candidates are re-scored against the full-precision embeddings on the members.
+    A pre-built normalized (matrix, scales) pair with one row per embedded member, such as the
+    memory-mapped one from member_store.load_search_embeddings, can be passed to skip building it.
+    """
+
+    def __init__(self, members, embedding_key="combined_embedding", ann_index=None, n_probe=8,
+                 precision="float32", rerank=0, normalized=None):
+        self.members = [member for member in members if isinstance(member, dict) and member.get(embedding_key) is not None]
+        self.embedding_key = embedding_key
+        self.row_by_id = {member["id"]: row for row, member in enumerate(self.members)}
+        self.ann_index = ann_index
+        self.n_probe = n_probe
+        self.precision = precision
+        self.rerank = rerank if precision != "float32" else 0
+        self._ann_rows = None
+
+        if normalized is not None:
+            self.embeddings, self.scales = normalized
+            if len(self.embeddings) != len(self.members):
+                raise ValueError(f"Search matrix has {len(self.embeddings)} rows for {len(self.members)} embedded members.")
+        elif self.members:
+            self.embeddings, self.scales = quantize(self.full_precision_rows(np.arange(len(self.members))), precision)
+        else:
+            self.embeddings, self.scales = np.zeros((0, 0), dtype=np.float32), None
+
+        self.skill_masks = {}
+        self.city_masks = {}
+        for row, member in enumerate(self.members):
+            for skill in member.get("areas_of_expertise") or []:
+                self.skill_masks.setdefault(skill, np.zeros(len(self.members), dtype=bool))[row] = True
+            city = member.get("city")
+            if city:
+                self.city_masks.setdefault(city, np.zeros(len(self.members), dtype=bool))[row] = True
+
+    def __len__(self):
+        return len(self.members)
+
+    def full_precision_rows(self, rows):
+        return normalize_rows(np.asarray([self.members[row][self.embedding_key] for row in rows], dtype=np.float32))
+
+    def filter_mask(self, skill=None, city=None):
+        """
+        Returns a boolean row mask for the given skill and city filters, or None when unfiltered.
+        """
+        mask = None
+        for masks, value in ((self.skill_masks, skill), (self.city_masks, city)):
+            if value is None or value == "All":
+                continue
+            value_mask = masks.get(value, np.zeros(len(self.members), dtype=bool))
+            mask = value_mask if mask is None else mask & value_mask
+        return mask
+
+    def scores(self, query_embedding, rows=None):
+        query = self.normalize_query(query_embedding)
+        matrix = self.embeddings if rows is None else self.embeddings[rows]
+        if matrix.dtype == np.float32:
+            scores = matrix @ query
+        else:
+            scores = np.empty(len(matrix), dtype=np.float32)
+            for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+                scores[start:start + SCORE_BLOCK_ROWS] = matrix[start:start + SCORE_BLOCK_ROWS].astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    def top_k(self, scores, k, mask=None):
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.array([], dtype=np.int64)
+        rows = np.argpartition(-scores, k - 1)[:k]
+        return rows[np.argsort(-scores[rows])]
+
+    def normalize_query(self, query_embedding):
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return query / norm if norm else query
+
+    def search(self, query_embedding, k=20, skill=None, city=None, exact=False, n_probe=None):
+        """
+        Returns the top k (member, similarity) pairs for the query, best first.
+        """
+        if not self.members:
+            return []
+        mask = self.filter_mask(skill, city)
+        candidates = max(k, self.rerank)
+        if self.ann_index is not None and not exact:
+            rows, scores = self.approximate_search(query_embedding, candidates, mask, n_probe or self.n_probe)
+            # Heavily filtered queries may not have k matches among the probed lists.
+            if len(rows) >= candidates or (mask is not None and len(rows) >= mask.sum()):
+                return self.results(query_embedding, rows, scores, k)
+
+        scores = self.scores(query_embedding)
+        rows = self.top_k(scores, candidates, mask)
+        return self.results(query_embedding, rows, scores[rows], k)
+
+    def results(self, query_embedding, rows, scores, k):
+        if self.rerank and len(rows):
+            scores = self.full_precision_rows(rows) @ self.normalize_query(query_embedding)
+            order = np.argsort(-scores)
+            rows, scores = rows[order], scores[order]
+        return [(self.members[row], float(score)) for row, score in zip(rows[:k], scores[:k])]
+
+    def ann_rows(self):
+        # Maps ANN index positions to matrix rows (-1 for ids this index doesn't hold).
+        if self._ann_rows is None or len(self._ann_rows) != len(self.ann_index):
+            self._ann_rows = np.array([self.row_by_id.get(member_id, -1) for member_id in self.ann_index.ids], dtype=np.int64)
+        return self._ann_rows
+
+    def approximate_search(self, query_embedding, k, mask, n_probe):
+        query = self.normalize_query(query_embedding)
+        rows = self.ann_rows()[self.ann_index.candidate_positions(query, n_probe)]
+        rows = rows[rows >= 0]
+        if mask is not None:
+            rows = rows[mask[rows]]
+        scores = self.scores(query, rows)
+        best = self.top_k(scores, k)
+        return rows[best], scores[best]
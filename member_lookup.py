@@ -0,0 +1,67 @@
+from functools import reduce
+
+import numpy as np
+
+class MemberLookup:
+    """
+    Lookup tables built once at load time: id -> member, plus skill, city and project inverted
+    indexes holding sorted arrays of member rows, so filters are array intersections.
+    """
+
+    def __init__(self, members):
+        self.members = [member for member in members if isinstance(member, dict)]
+        self.by_id = {member["id"]: member for member in self.members}
+        self.row_by_id = {member["id"]: row for row, member in enumerate(self.members)}
+
+        skill_rows, city_rows, project_rows = {}, {}, {}
+        for row, member in enumerate(self.members):
+            for skill in member.get("areas_of_expertise") or []:
+                skill_rows.setdefault(skill, []).append(row)
+            if member.get("city"):
+                city_rows.setdefault(member["city"], []).append(row)
+            project_key = project_key_for(member)
+            if project_key:
+                project_rows.setdefault(project_key, []).append(row)
+
+        self.skill_rows = {skill: np.array(rows, dtype=np.int64) for skill, rows in skill_rows.items()}
+        self.city_rows = {city: np.array(rows, dtype=np.int64) for city, rows in city_rows.items()}
+        self.project_rows = {project: np.array(rows, dtype=np.int64) for project, rows in project_rows.items()}
+        self.all_rows = np.arange(len(self.members), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.members)
+
+    def member(self, member_id):
+        return self.by_id.get(member_id)
+
+    def member_name(self, member_id):
+        member = self.by_id.get(member_id)
+        return member["name"] if member else None
+
+    def team_member_names(self, member):
+        team_member_ids = (member.get("project_details") or {}).get("Team members", [])
+        if not isinstance(team_member_ids, list):
+            return []
+        return [name for name in (self.member_name(member_id) for member_id in team_member_ids) if name]
+
+    def project_members(self, project_key):
+        return [self.members[row] for row in self.project_rows.get(project_key, [])]
+
+    def filter_rows(self, skills=(), cities=()):
+        """
+        Rows of members that have every given skill and are in every given city ("All" is ignored).
+        """
+        row_sets = [self.skill_rows.get(skill, self.all_rows[:0]) for skill in skills if skill != "All"]
+        row_sets += [self.city_rows.get(city, self.all_rows[:0]) for city in cities if city != "All"]
+        if not row_sets:
+            return self.all_rows
+        return reduce(lambda left, right: np.intersect1d(left, right, assume_unique=True), sorted(row_sets, key=len))
+
+    def members_at(self, rows):
+        return [self.members[row] for row in rows]
+
+def project_key_for(member):
+    if member.get("project_id"):
+        return member["project_id"]
+    project_name = (member.get("project_details") or {}).get("Name")
+    return project_name if project_name and project_name != "N/A" else None
@@ -0,0 +1,230 @@
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from member_index import PRECISIONS, normalize_rows, quantize
+
+DATA_DIR = "data"
+# Names the generation of the files below that is current. Each save writes a new generation and
+# switches this file last, so a crash mid-save leaves the previous generation in place.
+CURRENT_FILE = "current.json"
+METADATA_FILE = "members.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+SYNC_STATE_FILE = "sync_state.json"
+EMBEDDING_KEY = "combined_embedding"
+LEGACY_MEMBERS_FILE = "members.py"
+GENERATION_FILE_PATTERN = re.compile(r"^[a-z_]+\.(g\d+)\.")
+
+def generation_path(name, generation, data_dir=DATA_DIR):
+    # "embeddings.npy" of generation "g1" is "embeddings.g1.npy"; stores from before generations
+    # (generation "") use the plain names.
+    stem, extension = name.split(".", 1)
+    return os.path.join(data_dir, f"{stem}.{generation}.{extension}" if generation else name)
+
+def current_generation(data_dir=DATA_DIR):
+    path = os.path.join(data_dir, CURRENT_FILE)
+    if not os.path.exists(path):
+        return ""
+    with open(path, "r") as f:
+        return json.load(f)["generation"]
+
+def metadata_path(data_dir=DATA_DIR, generation=""):
+    return generation_path(METADATA_FILE, generation, data_dir)
+
+def embeddings_path(data_dir=DATA_DIR, generation=""):
+    return generation_path(EMBEDDINGS_FILE, generation, data_dir)
+
+def data_version(data_dir=DATA_DIR):
+    """
+    Changes whenever a save makes a new generation current; used to key caches derived from
+    member data. Stores from before generations fall back to their metadata file.
+    """
+    for path in (os.path.join(data_dir, CURRENT_FILE), metadata_path(data_dir)):
+        if os.path.exists(path):
+            return os.stat(path).st_mtime_ns
+    return 0
+
+def load_metadata(data_dir=DATA_DIR, generation=None):
+    """
+    Loads member records without their embeddings. Returns an empty list if there is no store yet.
+    The load functions read the current generation unless they are given one.
+    """
+    generation = current_generation(data_dir) if generation is None else generation
+    if not os.path.exists(metadata_path(data_dir, generation)):
+        return []
+    with open(metadata_path(data_dir, generation), "r") as f:
+        return json.load(f)["members"]
+
+def load_embeddings(data_dir=DATA_DIR, mmap_mode="r", generation=None):
+    """
+    Loads the float32 embedding matrix; row i belongs to the i-th member in the metadata file.
+    """
+    generation = current_generation(data_dir) if generation is None else generation
+    return np.load(embeddings_path(data_dir, generation), mmap_mode=mmap_mode)
+
+def search_embeddings_path(precision, data_dir=DATA_DIR, scales=False, generation=""):
+    return generation_path(f"embeddings.{precision}{'.scales' if scales else ''}.npy", generation, data_dir)
+
+def load_search_embeddings(precision, data_dir=DATA_DIR, mmap_mode="r", generation=None):
+    """
+    Loads the normalized (matrix, scales) pair MemberIndex searches at the given precision, or None
+    if the store has none. There is one row per member with an embedding, in metadata order.
+    Memory-mapped, so server processes on one host share the pages.
+    """
+    generation = current_generation(data_dir) if generation is None else generation
+    if not os.path.exists(search_embeddings_path(precision, data_dir, generation=generation)):
+        return None
+    matrix = np.load(search_embeddings_path(precision, data_dir, generation=generation), mmap_mode=mmap_mode)
+    scales_path = search_embeddings_path(precision, data_dir, scales=True, generation=generation)
+    scales = np.load(scales_path) if os.path.exists(scales_path) else None
+    return matrix, scales
+
+def load_members(data_dir=DATA_DIR, mmap_mode="r", generation=None):
+    """
+    Loads member records with "combined_embedding" attached as a row view of the embedding matrix.
+    The matrix is memory-mapped, so only the metadata is parsed up front.
+    """
+    generation = current_generation(data_dir) if generation is None else generation
+    members = load_metadata(data_dir, generation)
+    if not members:
+        return members
+
+    embeddings = load_embeddings(data_dir, mmap_mode, generation)
+    if len(embeddings) != len(members):
+        raise ValueError(f"Member store is inconsistent: {len(members)} members but {len(embeddings)} embeddings.")
+
+    for row, member in enumerate(members):
+        if member.pop("has_embedding", True):
+            member[EMBEDDING_KEY] = embeddings[row]
+    return members
+
+def replace_file(path, write):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def new_generation():
+    return f"g{time.time_ns()}"
+
+def save_members(members, data_dir=DATA_DIR):
+    """
+    Writes members as a new generation of files and makes it current.
+    """
+    generation = new_generation()
+    write_members(members, data_dir, generation)
+    commit_generation(data_dir, generation)
+
+def write_members(members, data_dir, generation):
+    """
+    Writes member metadata to JSON and embeddings to a row-aligned float32 .npy matrix, as the
+    files of generation. Other files derived from the members (see ann_index and teammates) can be
+    written for the same generation before commit_generation makes it current.
+    """
+    members = [member for member in members if isinstance(member, dict)]
+    dimensions = next((len(member[EMBEDDING_KEY]) for member in members if member.get(EMBEDDING_KEY) is not None), 0)
+
+    embeddings = np.zeros((len(members), dimensions), dtype=np.float32)
+    has_embedding = np.zeros(len(members), dtype=bool)
+    metadata = []
+    for row, member in enumerate(members):
+        record = {key: value for key, value in member.items() if key != EMBEDDING_KEY}
+        embedding = member.get(EMBEDDING_KEY)
+        record["has_embedding"] = embedding is not None and len(embedding) == dimensions
+        if record["has_embedding"]:
+            embeddings[row] = embedding
+            has_embedding[row] = True
+        metadata.append(record)
+
+    os.makedirs(data_dir, exist_ok=True)
+    replace_file(embeddings_path(data_dir, generation), lambda f: np.save(f, embeddings))
+    save_search_embeddings(embeddings[has_embedding], data_dir, generation)
+    replace_file(metadata_path(data_dir, generation), lambda f: f.write(json.dumps({"dimensions": dimensions, "members": metadata}).encode("utf-8")))
+
+def commit_generation(data_dir, generation):
+    """
+    Makes generation current in one atomic replace of CURRENT_FILE, once all of its files are
+    written. The previous generation is kept for readers that are still opening it.
+    """
+    previous_generation = current_generation(data_dir)
+    replace_file(os.path.join(data_dir, CURRENT_FILE), lambda f: f.write(json.dumps({"generation": generation}).encode("utf-8")))
+    remove_old_generations(data_dir, (generation, previous_generation))
+
+def save_search_embeddings(embeddings, data_dir=DATA_DIR, generation=""):
+    normalized = normalize_rows(embeddings)
+    for precision in PRECISIONS:
+        matrix, scales = quantize(normalized, precision)
+        replace_file(search_embeddings_path(precision, data_dir, generation=generation), lambda f: np.save(f, matrix))
+        if scales is not None:
+            replace_file(search_embeddings_path(precision, data_dir, scales=True, generation=generation), lambda f: np.save(f, scales))
+
+def remove_old_generations(data_dir, keep):
+    """
+    Deletes the files of every generation not in keep, including ones left by an interrupted save.
+    Processes that still have old files memory-mapped keep reading them until they reload.
+    """
+    paths = [os.path.join(data_dir, name) for name in os.listdir(data_dir)
+             if GENERATION_FILE_PATTERN.match(name) and GENERATION_FILE_PATTERN.match(name).group(1) not in keep]
+    if "" not in keep:
+        paths += [metadata_path(data_dir), embeddings_path(data_dir)]
+        paths += [search_embeddings_path(precision, data_dir, scales) for precision in PRECISIONS for scales in (False, True)]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def load_sync_state(data_dir=DATA_DIR):
+    """
+    Loads the Airtable sync watermark and per-record hashes written by the last successful sync.
+    """
+    path = os.path.join(data_dir, SYNC_STATE_FILE)
+    if not os.path.exists(path):
+        return {"members_synced_at": None, "members": {}, "projects": {}, "retry_member_ids": []}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_sync_state(sync_state, data_dir=DATA_DIR):
+    os.makedirs(data_dir, exist_ok=True)
+    replace_file(os.path.join(data_dir, SYNC_STATE_FILE), lambda f: f.write(json.dumps(sync_state).encode("utf-8")))
+
+def read_legacy_members(path=LEGACY_MEMBERS_FILE):
+    """
+    Reads the old `members = [...]` data file. It was written with json.dump, so parse it as JSON
+    rather than executing it.
+    """
+    with open(path, "r") as f:
+        source = f.read()
+    _, _, literal = source.partition("=")
+    members = json.loads(literal)
+    return [member for member in members if isinstance(member, dict)]
+
+def migrate_legacy_videos(members):
+    """
+    Moves base64 videos out of the member records and into the media store, keeping only their details.
+    """
+    # Only needed for the one-off migration; media pulls in the HTTP clients.
+    from media import MediaStore, video_details
+
+    media_store = MediaStore()
+    for member in members:
+        video_base64 = member.pop("video_base64", "")
+        video_url = (member.get("project_details") or {}).get("Demo", "")
+        member["video"] = video_details(media_store.import_base64(video_url, video_base64)) if video_base64 and video_url else {}
+
+def migrate_legacy_members(path=LEGACY_MEMBERS_FILE, data_dir=DATA_DIR):
+    members = read_legacy_members(path)
+    for member in members:
+        # Build updates (with an embedding each) are no longer searched or shown.
+        member.pop("projects", None)
+    migrate_legacy_videos(members)
+    save_members(members, data_dir)
+    print(f"Migrated {len(members)} members from {path} to {data_dir}/")
+    return members
+
+if __name__ == "__main__":
+    migrate_legacy_members(*sys.argv[1:3])
@@ -0,0 +1,154 @@
+from collections import Counter
+from contextlib import contextmanager
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+SAMPLE_INTERVAL = 0.005
+
+class Metrics:
+    """
+    Process-wide timing spans and counters. A span records how often a block ran and its total
+    and slowest wall time. Counters are plain sums, e.g. bytes transferred or cache hits.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.spans = {}
+            self.counters = Counter()
+            self.started_at = time.time()
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self.lock:
+            span = self.spans.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            span["count"] += 1
+            span["total_seconds"] += seconds
+            span["max_seconds"] = max(span["max_seconds"], seconds)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def snapshot(self):
+        with self.lock:
+            spans = {name: {**span, "mean_seconds": span["total_seconds"] / span["count"]} for name, span in sorted(self.spans.items())}
+            return {"since": self.started_at, "spans": spans, "counters": dict(sorted(self.counters.items()))}
+
+metrics = Metrics()
+
+def span(name):
+    return metrics.span(name)
+
+def count(name, amount=1):
+    metrics.count(name, amount)
+
+def timed(name):
+    """
+    Decorator recording each call of a function (or coroutine function) as a span.
+    """
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with metrics.span(name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with metrics.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def write_report(path, report):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+class Sampler:
+    """
+    Sampling profiler: records every thread's stack each interval and counts identical stacks.
+    Cheap enough to leave on for a whole sync; output is in the collapsed-stack format that
+    flame graph tools read. enable/disable mirror cProfile.Profile.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def enable(self):
+        self.thread.start()
+
+    def disable(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {samples}\n" for stack, samples in self.stacks.most_common())
+
+@contextmanager
+def profiled(mode, path):
+    """
+    Profiles the block with cProfile ("cprofile", writes pstats data) or the Sampler ("sample",
+    writes collapsed stacks) to path. Any other mode, including None, profiles nothing.
+    """
+    if mode not in ("cprofile", "sample"):
+        yield None
+        return
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    profiler = cProfile.Profile() if mode == "cprofile" else Sampler()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if mode == "cprofile":
+            profiler.dump_stats(path)
+        else:
+            with open(path, "w") as f:
+                f.write(profiler.collapsed())
+        print(f"Profile written to {path}")
+
+def top_functions(profile, limit=25):
+    # The slowest functions of a cProfile.Profile by cumulative time, as text.
+    output = io.StringIO()
+    pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
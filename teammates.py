@@ -0,0 +1,148 @@
+import hashlib
+import os
+
+import numpy as np
+
+from member_index import normalize_rows
+from member_lookup import project_key_for
+from member_store import DATA_DIR, EMBEDDING_KEY, current_generation, generation_path, replace_file
+
+# Written for each generation of the member store, in the row order of its members.
+TEAMMATES_FILE = "teammates.npz"
+SUGGESTIONS = 10
+# Nearest neighbours per member that are re-ranked for city and skill fit.
+CANDIDATES = 50
+BLOCK_ROWS = 1024
+# Caps a block's similarity matrix (rows x open members) so large rosters use smaller blocks.
+BLOCK_ELEMENTS = 2 ** 26
+SAME_CITY_BONUS = 0.05
+SKILL_DIVERSITY_WEIGHT = 0.1
+
+def is_open(member):
+    """
+    Members who are looking for teammates: they said so, or they entered as individuals.
+    """
+    looking = str(member.get("looking_for_team_members") or "").strip().lower()
+    entry_type = str(member.get("entry_type") or "").strip().lower()
+    return looking.startswith("yes") or entry_type.startswith("individual")
+
+def ids_hash(members):
+    return hashlib.sha256("\0".join(member["id"] for member in members).encode("utf-8")).hexdigest()
+
+def skill_matrix(members):
+    skills = sorted(set(skill for member in members for skill in member.get("areas_of_expertise") or []))
+    column = {skill: index for index, skill in enumerate(skills)}
+    matrix = np.zeros((len(members), len(skills)), dtype=np.float32)
+    for row, member in enumerate(members):
+        for skill in member.get("areas_of_expertise") or []:
+            matrix[row, column[skill]] = 1
+    return matrix
+
+def codes(values):
+    # Small integer code per distinct value; -1 for missing values, which never match.
+    code = {}
+    return np.array([code.setdefault(value, len(code)) if value else -1 for value in values], dtype=np.int64)
+
+def compute_table(members, k=SUGGESTIONS, candidates=CANDIDATES, block_rows=BLOCK_ROWS):
+    """
+    Suggested teammates for every open member, as (rows, scores) arrays of shape (len(members), k)
+    holding neighbour rows into `members` (-1 where there are fewer than k).
+
+    Similarity is computed all-pairs in blocks of block_rows over the open members' normalized
+    embeddings. Each member's top `candidates` (excluding their own project) are re-ranked by
+    similarity plus a same-city bonus and a bonus for skills the member doesn't already have.
+    """
+    rows = np.full((len(members), k), -1, dtype=np.int32)
+    scores = np.zeros((len(members), k), dtype=np.float32)
+    open_rows = np.array([row for row, member in enumerate(members) if is_open(member) and member.get(EMBEDDING_KEY) is not None], dtype=np.int64)
+    if len(open_rows) < 2:
+        return rows, scores
+
+    open_members = [members[row] for row in open_rows]
+    embeddings = normalize_rows(np.asarray([member[EMBEDDING_KEY] for member in open_members], dtype=np.float32))
+    skills = skill_matrix(open_members)
+    skill_counts = skills.sum(axis=1)
+    cities = codes(member.get("city") for member in open_members)
+    projects = codes(project_key_for(member) for member in open_members)
+    candidates = min(candidates, len(open_members) - 1)
+    block_rows = max(1, min(block_rows, BLOCK_ELEMENTS // len(open_members)))
+
+    for start in range(0, len(open_members), block_rows):
+        block = np.arange(start, min(start + block_rows, len(open_members)))
+        similarity = embeddings[block] @ embeddings.T
+        similarity[np.arange(len(block)), block] = -np.inf
+        # Members of the same project are already teammates.
+        same_project = (projects[block, None] == projects[None, :]) & (projects[block, None] >= 0)
+        similarity[same_project] = -np.inf
+
+        nearest = np.argpartition(-similarity, candidates - 1, axis=1)[:, :candidates]
+        nearest_similarity = np.take_along_axis(similarity, nearest, axis=1)
+        same_city = (cities[block, None] == cities[nearest]) & (cities[block, None] >= 0)
+        # Share of each candidate's skills the member doesn't have.
+        shared_skills = np.einsum("bs,bcs->bc", skills[block], skills[nearest])
+        new_skills = np.divide(skill_counts[nearest] - shared_skills, skill_counts[nearest],
+                               out=np.zeros_like(shared_skills), where=skill_counts[nearest] > 0)
+        ranked = nearest_similarity + SAME_CITY_BONUS * same_city + SKILL_DIVERSITY_WEIGHT * new_skills
+
+        order = np.argsort(-ranked, axis=1)[:, :k]
+        best = np.take_along_axis(nearest, order, axis=1)
+        best_scores = np.take_along_axis(ranked, order, axis=1)
+        valid = np.isfinite(best_scores)
+        rows[open_rows[block], :best.shape[1]] = np.where(valid, open_rows[best], -1)
+        scores[open_rows[block], :best.shape[1]] = np.where(valid, best_scores, 0)
+    return rows, scores
+
+def table_path(data_dir=DATA_DIR, generation=""):
+    return generation_path(TEAMMATES_FILE, generation, data_dir)
+
+def update_table(members, generation, data_dir=DATA_DIR):
+    """
+    Recomputes and saves the teammate table for `members` as a file of the store generation they
+    are written to, in the order the member store saved them.
+    """
+    members = [member for member in members if isinstance(member, dict)]
+    rows, scores = compute_table(members)
+    os.makedirs(data_dir, exist_ok=True)
+    replace_file(table_path(data_dir, generation),
+                 lambda f: np.savez(f, rows=rows, scores=scores, ids_hash=np.array(ids_hash(members))))
+
+def read_table(data_dir=DATA_DIR, generation=None):
+    """
+    Reads the arrays of a generation's table (the current one by default), or returns None if
+    there is no table for it.
+    """
+    path = table_path(data_dir, current_generation(data_dir) if generation is None else generation)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as saved:
+        return {name: saved[name] for name in saved.files}
+
+class TeammateTable:
+    """
+    Precomputed suggestions, looked up by member row in O(k).
+    """
+
+    def __init__(self, members, rows, scores):
+        self.members = members
+        self.rows = rows
+        self.scores = scores
+
+    @classmethod
+    def from_saved(cls, members, saved):
+        """
+        The table from read_table if it was computed for exactly these members, otherwise None
+        (no table yet, or one computed for a different roster).
+        """
+        if saved is None:
+            return None
+        if str(saved["ids_hash"]) != ids_hash(members):
+            print("Teammate table doesn't match the member store, not suggesting teammates.")
+            return None
+        return cls(members, saved["rows"], saved["scores"])
+
+    def suggestions(self, row, limit=None):
+        """
+        Returns (member, score) pairs suggested for the member at row, best first.
+        """
+        neighbours = self.rows[row][:limit]
+        return [(self.members[neighbour], float(score)) for neighbour, score in zip(neighbours, self.scores[row]) if neighbour >= 0]
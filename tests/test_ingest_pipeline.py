@@ -0,0 +1,93 @@
+"""
+The ingest pipeline against the mock Airtable (benchmarks/mock_servers.py). A stage that raises
+mid-run must fail the run promptly rather than leave the other stages blocked on full queues,
+and a rerun with the same checkpoint and spool must pick up where the failed run stopped.
+"""
+import asyncio
+
+import pytest
+
+from airtable_reader import Checkpoint
+from ingest_pipeline import IngestPipeline, Spool
+from media import MediaStore
+from mock_servers import MEMBERS_TABLE, MockServices
+
+MEMBERS = 60
+PAGE_SIZE = 10
+QUERIES = [{"pageSize": PAGE_SIZE}]
+# Seconds before a run counts as hung.
+TIMEOUT = 60
+
+class InjectedFailure(Exception):
+    pass
+
+def embedder(fail_after=None):
+    """
+    embed_members stand-in that records the ids of each batch, and raises on the first batch
+    after fail_after members were embedded.
+    """
+    batches = []
+
+    def embed_members(members):
+        if fail_after is not None and sum(map(len, batches)) >= fail_after:
+            raise InjectedFailure(f"embedding failed after {fail_after} members")
+        batches.append([member["id"] for member in members])
+    embed_members.batches = batches
+    return embed_members
+
+def build_pipeline(embed_members):
+    # Small batches and queues, so every stage has backed up by the time the embedding fails.
+    return IngestPipeline(
+        build_member=lambda record, project_videos: {"id": record["id"], "name": record["fields"].get("Name")},
+        find_video_url=lambda record: None,
+        embed_members=embed_members,
+        media_store=MediaStore(),
+        embedding_batch_size=4,
+        embedding_linger=0.05,
+        queue_size=4,
+    )
+
+def run(pipeline, url, checkpoint=None, spool=None):
+    return asyncio.run(asyncio.wait_for(pipeline.run(url, {}, QUERIES, checkpoint, spool), TIMEOUT))
+
+@pytest.fixture
+def services(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "member_images").mkdir()
+    with MockServices(MEMBERS, dimensions=8, airtable_rate=0, page_size=PAGE_SIZE) as services:
+        yield services
+
+@pytest.fixture
+def url(services):
+    base, table = MEMBERS_TABLE
+    return f"{services.airtable_url}/{base}/{table}"
+
+def test_failing_stage_stops_the_run(url):
+    with pytest.raises(InjectedFailure):
+        run(build_pipeline(embedder(fail_after=25)), url)
+
+def test_rerun_resumes_from_checkpoint(services, url, tmp_path):
+    member_ids = list(services.tables[MEMBERS_TABLE].records)
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"), url, QUERIES)
+    spool = Spool(str(tmp_path / "spool.jsonl"))
+    with pytest.raises(InjectedFailure):
+        run(build_pipeline(embedder(fail_after=25)), url, checkpoint, spool)
+
+    # The pages finished before the failure are checkpointed, and their members spooled.
+    cursor = checkpoint.load()
+    assert cursor is not None and cursor[0] == 0
+    finished = int(cursor[1].split("/")[1])
+    assert 0 < finished < MEMBERS
+    spooled_ids = {entry["member"]["id"] for entry in spool.load() if entry["type"] == "member"}
+    assert set(member_ids[:finished]) <= spooled_ids
+
+    pages_before = services.counters["airtable_pages"]
+    embed_members = embedder()
+    processed_members, accepted_records = run(build_pipeline(embed_members), url, checkpoint, spool)
+
+    # The rerun only fetches and embeds the unfinished pages, and returns every member.
+    assert services.counters["airtable_pages"] - pages_before == (MEMBERS - finished) // PAGE_SIZE
+    embedded_ids = {member_id for batch in embed_members.batches for member_id in batch}
+    assert embedded_ids == set(member_ids[finished:])
+    assert {member["id"] for member in processed_members} == set(member_ids)
+    assert {record["id"] for record in accepted_records} == set(member_ids)
@@ -0,0 +1,98 @@
+from collections import Counter
+import re
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Fields indexed for each member; skills and names are short, so they are repeated to weigh more.
+TEXT_FIELDS = ("member_text_representation", "project_text_representation", "bio")
+BOOSTED_FIELDS = ("name", "areas_of_expertise", "city")
+# Labels from the text representations ("Name: ...", "City: ...") that would otherwise match everything.
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "i", "in", "is", "it", "me",
+    "my", "of", "on", "or", "that", "the", "to", "was", "we", "what", "who", "with", "works", "n",
+    "name", "areas", "expertise", "entry", "type", "looking", "team", "members", "dietary", "requirements",
+    "city", "overview", "demo", "github",
+}
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def member_document(member):
+    parts = [str(member.get(field) or "") for field in TEXT_FIELDS]
+    for field in BOOSTED_FIELDS:
+        value = member.get(field) or ""
+        value = " ".join(value) if isinstance(value, list) else str(value)
+        parts += [value] * 2
+    return " ".join(parts)
+
+class TextIndex:
+    """
+    In-process BM25 index over member text. Each term's BM25 weight per document is precomputed,
+    so scoring a query is one scatter-add per query term.
+    """
+
+    def __init__(self, members, k1=1.2, b=0.75):
+        self.members = [member for member in members if isinstance(member, dict)]
+        documents = [Counter(tokenize(member_document(member))) for member in self.members]
+        lengths = np.array([sum(document.values()) for document in documents], dtype=np.float32)
+        average_length = lengths.mean() if len(lengths) else 0.0
+
+        postings = {}
+        for row, document in enumerate(documents):
+            for term, frequency in document.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(row)
+                postings[term][1].append(frequency)
+
+        self.postings = {}
+        count = len(self.members)
+        for term, (rows, frequencies) in postings.items():
+            rows = np.array(rows, dtype=np.int64)
+            frequencies = np.array(frequencies, dtype=np.float32)
+            idf = np.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+            norms = k1 * (1 - b + b * lengths[rows] / average_length)
+            self.postings[term] = (rows, (idf * frequencies * (k1 + 1) / (frequencies + norms)).astype(np.float32))
+
+    def __len__(self):
+        return len(self.members)
+
+    def scores(self, query):
+        scores = np.zeros(len(self.members), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self.postings:
+                rows, weights = self.postings[term]
+                scores[rows] += weights
+        return scores
+
+    def search(self, query, k=20):
+        """
+        Returns the top k (member, BM25 score) pairs with a non-zero score, best first.
+        """
+        if not self.members:
+            return []
+        scores = self.scores(query)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        rows = np.argpartition(-scores, k - 1)[:k]
+        rows = rows[np.argsort(-scores[rows])]
+        return [(self.members[row], float(scores[row])) for row in rows]
+
+def is_keyword_query(query, max_terms=3):
+    """
+    Short queries without a question (a name, a city, a tool) are answered lexically.
+    """
+    return 0 < len(TOKEN_PATTERN.findall(query)) <= max_terms and not query.strip().endswith("?")
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses ranked member lists by summing 1 / (k + rank) per member; returns members, best first.
+    """
+    scores = {}
+    members = {}
+    for ranking in rankings:
+        for rank, member in enumerate(ranking, start=1):
+            scores[member["id"]] = scores.get(member["id"], 0.0) + 1.0 / (k + rank)
+            members[member["id"]] = member
+    return [members[member_id] for member_id in sorted(scores, key=scores.get, reverse=True)]